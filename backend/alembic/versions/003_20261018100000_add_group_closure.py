@@ -0,0 +1,55 @@
+"""add_group_closure
+
+Revision ID: 003_20261018100000_add_group_closure
+Revises: fb92c6dfa6fe
+Create Date: 2026-10-18 10:00:00.000000
+
+Closure table для дерева груп:
+- group_closure (ancestor_id, descendant_id, depth), включно з depth = 0
+- заповнення з groups.parent_id рекурсивним CTE
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003_20261018100000_add_group_closure'
+down_revision = 'fb92c6dfa6fe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    print("Creating group_closure table...")
+
+    op.create_table(
+        'group_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.CheckConstraint('depth >= 0', name='group_closure_depth_check')
+    )
+
+    # Предки групи: WHERE descendant_id = ? ORDER BY depth
+    op.create_index('idx_group_closure_descendant', 'group_closure', ['descendant_id', 'depth'])
+
+    print("Populating group_closure...")
+
+    op.execute("""
+        WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM groups
+            UNION ALL
+            SELECT tree.ancestor_id, g.id, tree.depth + 1
+            FROM tree
+            JOIN groups g ON g.parent_id = tree.descendant_id
+        )
+        INSERT INTO group_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM tree
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_group_closure_descendant', table_name='group_closure')
+    op.drop_table('group_closure')
@@ -0,0 +1,131 @@
+"""accrual_summary_table
+
+Revision ID: 004_20261018120000_accrual_summary_table
+Revises: 003_20261018100000_add_group_closure
+Create Date: 2026-10-18 12:00:00.000000
+
+accrual_summary - звичайна таблиця з колонками колишнього materialized view
+(міграція 002) і result_id як первинним ключем:
+- таблиця заповнюється з accrual_results
+- далі зріз документа перезаписується при записі, затвердженні і скасуванні
+  (app/services/accrual_summary.py)
+
+Materialized view з REFRESH ... CONCURRENTLY не використовується: навіть
+конкурентне оновлення перераховує всю історію accrual_results, а зведення
+відстає від документів до наступного оновлення. Залишок view (якщо є) видаляється.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004_20261018120000_accrual_summary_table'
+down_revision = '003_20261018100000_add_group_closure'
+branch_labels = None
+depends_on = None
+
+
+def _period_columns() -> str:
+    # Залежно від версії схеми період зберігає дати або точний час
+    inspector = sa.inspect(op.get_bind())
+    columns = [col['name'] for col in inspector.get_columns('calculation_periods')]
+    if 'start_datetime' in columns:
+        return "cp.start_datetime,\n            cp.end_datetime"
+    return (
+        "cp.start_date::timestamp with time zone as start_datetime,\n"
+        "            cp.end_date::timestamp with time zone as end_datetime"
+    )
+
+
+def _summary_select() -> str:
+    return f"""
+        SELECT
+            ar.id as result_id,
+            ad.id as document_id,
+            ad.document_number,
+            ad.status as document_status,
+            cp.period_code,
+            cp.period_name,
+            {_period_columns()},
+            ct.name as template_name,
+            e.id as employee_id,
+            e.personnel_number,
+            e.first_name || ' ' || e.last_name as employee_name,
+            p.id as position_id,
+            p.position_name,
+            p.employment_rate,
+            ou.id as org_unit_id,
+            ou.name as org_unit_name,
+            ou.code as org_unit_code,
+            ar.rule_id,
+            ar.rule_code,
+            cr.name as rule_name,
+            cr.rule_type,
+            ar.rule_source_type,
+            ar.rule_source_id,
+            ar.amount,
+            ar.calculation_base,
+            ar.currency,
+            ar.created_at
+        FROM accrual_documents ad
+        JOIN calculation_periods cp ON cp.id = ad.period_id
+        JOIN calculation_templates ct ON ct.id = ad.template_id
+        JOIN accrual_results ar ON ar.document_id = ad.id
+        JOIN positions p ON p.id = ar.position_id
+        JOIN employees e ON e.id = ar.employee_id
+        JOIN organizational_units ou ON ou.id = ar.organizational_unit_id
+        JOIN calculation_rules cr ON cr.id = ar.rule_id
+        WHERE ar.status = 'active'
+    """
+
+
+def upgrade() -> None:
+    print("Creating accrual_summary table...")
+
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS accrual_summary")
+
+    op.create_table(
+        'accrual_summary',
+        sa.Column('result_id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('document_number', sa.String(length=50), nullable=False),
+        sa.Column('document_status', sa.String(length=20), nullable=False),
+        sa.Column('period_code', sa.String(length=50), nullable=False),
+        sa.Column('period_name', sa.String(length=255), nullable=False),
+        sa.Column('start_datetime', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('end_datetime', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('template_name', sa.String(length=255), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=False),
+        sa.Column('personnel_number', sa.String(length=50), nullable=False),
+        sa.Column('employee_name', sa.String(length=201), nullable=True),
+        sa.Column('position_id', sa.Integer(), nullable=True),
+        sa.Column('position_name', sa.String(length=255), nullable=True),
+        sa.Column('employment_rate', sa.Numeric(5, 4), nullable=True),
+        sa.Column('org_unit_id', sa.Integer(), nullable=True),
+        sa.Column('org_unit_name', sa.String(length=255), nullable=True),
+        sa.Column('org_unit_code', sa.String(length=50), nullable=True),
+        sa.Column('rule_id', sa.Integer(), nullable=False),
+        sa.Column('rule_code', sa.String(length=50), nullable=False),
+        sa.Column('rule_name', sa.String(length=255), nullable=True),
+        sa.Column('rule_type', sa.String(length=20), nullable=True),
+        sa.Column('rule_source_type', sa.String(length=20), nullable=True),
+        sa.Column('rule_source_id', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('calculation_base', sa.Numeric(12, 2), nullable=True),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('result_id'),
+        sa.ForeignKeyConstraint(['document_id'], ['accrual_documents.id'], ondelete='CASCADE')
+    )
+
+    op.create_index('ix_accrual_summary_document_id', 'accrual_summary', ['document_id'])
+    op.create_index('ix_accrual_summary_employee_id', 'accrual_summary', ['employee_id'])
+    op.create_index('ix_accrual_summary_period_code', 'accrual_summary', ['period_code'])
+
+    print("Populating accrual_summary...")
+
+    op.execute(f"INSERT INTO accrual_summary {_summary_select()}")
+
+
+def downgrade() -> None:
+    # Попередня ревізія (після fb92c6dfa6fe) не мала accrual_summary
+    op.drop_table('accrual_summary')
@@ -0,0 +1,69 @@
+"""rule_sql_to_formulas
+
+Revision ID: 005_20261018130000_rule_sql_to_formulas
+Revises: 004_20261018120000_accrual_summary_table
+Create Date: 2026-10-18 13:00:00.000000
+
+Правила MVP (BASE_SALARY, PIT, WAR_TAX) зберігали в sql_code SQL-запит, а шаблонний
+розрахунок підставляв замість нього формулу з коду. sql_code цих правил
+перетворюється на формулу, ставка береться з самого запиту:
+- SELECT c.base_rate as amount ...               -> base_salary
+- SELECT SUM(ar.amount) * <ставка> ... BASE_SALARY -> base_salary * <ставка>
+"""
+from alembic import op
+
+# revision identifiers
+revision = '005_20261018130000_rule_sql_to_formulas'
+down_revision = '004_20261018120000_accrual_summary_table'
+branch_labels = None
+depends_on = None
+
+
+# Двокрапки екрановано: op.execute виконує рядок як text(), де :name - параметр
+_BASE_SALARY_SQL = (
+    "SELECT c.base_rate as amount, e.id as employee_id "
+    "FROM employees e JOIN contracts c ON c.employee_id = e.id "
+    "WHERE c.is_active = true AND c.contract_type = ''salary'' AND e.id = \\:employee_id"
+)
+
+_BASE_SALARY_SHARE_SQL = (
+    "SELECT SUM(ar.amount) * ' || {rate} || ' as amount, ar.employee_id "
+    "FROM accrual_results ar "
+    "WHERE ar.document_id = \\:document_id AND ar.employee_id = \\:employee_id "
+    "AND ar.rule_code = ''BASE_SALARY'' AND ar.status = ''active'' "
+    "GROUP BY ar.employee_id"
+)
+
+
+def upgrade() -> None:
+    print("Converting MVP SQL rules to formulas...")
+
+    op.execute(r"""
+        UPDATE calculation_rules
+        SET sql_code = 'base_salary'
+        WHERE code = 'BASE_SALARY'
+          AND lower(sql_code) ~ '^\s*select\s+c\.base_rate\s+as\s+amount\M'
+    """)
+
+    op.execute(r"""
+        UPDATE calculation_rules
+        SET sql_code = 'base_salary * ' || substring(lower(sql_code) from 'sum\(ar\.amount\)\s*\*\s*([0-9]+(\.[0-9]+)?)')
+        WHERE code IN ('PIT', 'WAR_TAX')
+          AND lower(sql_code) ~ '^\s*select\s+sum\(ar\.amount\)\s*\*\s*[0-9]'
+          AND sql_code ~ 'rule_code\s*=\s*''BASE_SALARY'''
+    """)
+
+
+def downgrade() -> None:
+    op.execute(f"""
+        UPDATE calculation_rules
+        SET sql_code = '{_BASE_SALARY_SQL}'
+        WHERE code = 'BASE_SALARY' AND sql_code = 'base_salary'
+    """)
+
+    rate = r"substring(sql_code from '^base_salary \* ([0-9.]+)$')"
+    op.execute(f"""
+        UPDATE calculation_rules
+        SET sql_code = '{_BASE_SALARY_SHARE_SQL.format(rate=rate)}'
+        WHERE code IN ('PIT', 'WAR_TAX') AND sql_code ~ '^base_salary \\* [0-9.]+$'
+    """)
@@ -0,0 +1,25 @@
+"""groups_full_path_index
+
+Revision ID: 006_20261018140000_groups_full_path_index
+Revises: 005_20261018130000_rule_sql_to_formulas
+Create Date: 2026-10-18 14:00:00.000000
+
+Індекс ключа keyset-пагінації списку груп: (coalesce(full_path, ''), id).
+Звичайний індекс на full_path не обслуговує сортування за coalesce.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006_20261018140000_groups_full_path_index'
+down_revision = '005_20261018130000_rule_sql_to_formulas'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_groups_full_path_id', 'groups', [sa.text("coalesce(full_path, '')"), 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_groups_full_path_id', table_name='groups')
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import periods, employees, calculations, groups, payroll_calculation
+from app.api.endpoints import periods, employees, calculations, groups, payroll_calculation, jobs
 
 api_router = APIRouter()
 
@@ -9,3 +9,4 @@ api_router.include_router(employees.router, prefix="/employees", tags=["employee
 api_router.include_router(calculations.router, prefix="/calculations", tags=["calculations"])
 api_router.include_router(groups.router)
 api_router.include_router(payroll_calculation.router)
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
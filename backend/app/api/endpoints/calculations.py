@@ -1,16 +1,23 @@
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from pydantic import BaseModel
-from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_async_db, get_batch_db, get_db
 from app.models import (
     CalculationPeriod,
     AccrualDocument,
     AccrualResult,
-    CalculationTemplate,
-    TemplateRule,
-    Employee
+    CalculationTemplate
+)
+from app.services.accrual_calculation import (
+    document_number_for,
+    run_period_calculation
 )
+from app.services.accrual_recalculation import recalculate_period
+from app.services.accrual_summary import rebuild_summary, sync_document_summary
 
 router = APIRouter()
 
@@ -18,19 +25,15 @@ class CalculationRequest(BaseModel):
     period_id: int
     template_code: str = "MONTHLY_SALARY"
 
-@router.post("/run")
-async def run_calculation(
-    request: CalculationRequest,
-    db: Session = Depends(get_db)
-):
-    """Запустити розрахунок для періоду"""
+def get_run_inputs(db: Session, request: CalculationRequest, require_draft: bool = True):
+    """Перевірити період і шаблон запиту на розрахунок"""
     
     # Перевірка періоду
     period = db.get(CalculationPeriod, request.period_id)
     if not period:
         raise HTTPException(status_code=404, detail="Period not found")
     
-    if period.status != "draft":
+    if require_draft and period.status != "draft":
         raise HTTPException(status_code=400, detail="Period must be in draft status")
     
     # Перевірка шаблону
@@ -41,10 +44,12 @@ async def run_calculation(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    # Створення документа нарахування
-    doc_number = f"ACC-{period.period_code}-001"
+    return period, template
+
+def ensure_document_is_new(db: Session, period: CalculationPeriod):
+    """Перевірити що документ нарахування для періоду ще не створено"""
+    doc_number = document_number_for(period)
     
-    # Перевірка чи документ вже існує
     existing_doc = db.query(AccrualDocument).filter(
         AccrualDocument.document_number == doc_number
     ).first()
@@ -54,142 +59,140 @@ async def run_calculation(
             status_code=400,
             detail=f"Document {doc_number} already exists for this period"
         )
+
+@router.post("/run")
+def run_calculation(
+    request: CalculationRequest,
+    db: Session = Depends(get_batch_db)
+):
+    """Запустити розрахунок для періоду"""
     
-    accrual_doc = AccrualDocument(
-        document_number=doc_number,
-        period_id=period.id,
-        template_id=template.id,
-        organizational_unit_id=period.organizational_unit_id,
-        employee_id=period.employee_id,
-        status="draft",
-        calculation_date=datetime.utcnow(),
-        created_by="system"
-    )
+    period, template = get_run_inputs(db, request)
+    
+    # Перевірка чи документ вже існує
+    ensure_document_is_new(db, period)
+    
+    try:
+        return run_period_calculation(db, period, template)
+    except ValueError as e:
+        # Помилка формули правила - документ не створюється
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/recalculate")
+def recalculate(
+    request: CalculationRequest,
+    db: Session = Depends(get_batch_db)
+):
+    """Перерахувати лише позиції, змінені після останнього документа періоду"""
+    
+    # Коригування можливі і для не чернеткових періодів
+    period, template = get_run_inputs(db, request, require_draft=False)
+    
+    try:
+        return recalculate_period(db, period, template)
+    except LookupError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/summary/rebuild")
+def rebuild_accrual_summary(db: Session = Depends(get_batch_db)):
+    """Повністю перебудувати зведення accrual_summary"""
+    rows = rebuild_summary(db)
+    db.commit()
+    return {"rows": rows, "message": "Accrual summary rebuilt"}
+
+@router.post("/{document_id}/approve")
+def approve_document(
+    document_id: int,
+    approved_by: str = "system",
+    db: Session = Depends(get_db)
+):
+    """Затвердити документ нарахування"""
     
-    db.add(accrual_doc)
-    db.flush()  # Отримати ID документа
-    
-    # Отримати працівників для розрахунку
-    if period.employee_id:
-        employees = [db.get(Employee, period.employee_id)]
-    elif period.organizational_unit_id:
-        employees = db.query(Employee).filter(
-            Employee.organizational_unit_id == period.organizational_unit_id,
-            Employee.is_active == True
-        ).all()
-    else:
-        employees = db.query(Employee).filter(Employee.is_active == True).all()
-    
-    # Отримати правила з шаблону в порядку виконання
-    template_rules = db.query(TemplateRule).filter(
-        TemplateRule.template_id == template.id,
-        TemplateRule.is_active == True
-    ).order_by(TemplateRule.execution_order).all()
-    
-    results_count = 0
-    
-    # Виконати розрахунок для кожного працівника
-    for employee in employees:
-        # Виконати правила послідовно
-        for template_rule in template_rules:
-            rule = template_rule.rule
-            
-            # Спрощений розрахунок (для MVP)
-            # В реальності тут буде виконання SQL з правила
-            if rule.code == "BASE_SALARY":
-                # Отримати активний контракт
-                contract = next(
-                    (c for c in employee.contracts if c.is_active and c.contract_type == 'salary'),
-                    None
-                )
-                if contract:
-                    result = AccrualResult(
-                        document_id=accrual_doc.id,
-                        employee_id=employee.id,
-                        rule_id=rule.id,
-                        rule_code=rule.code,
-                        amount=contract.base_rate,
-                        calculation_base=contract.base_rate,
-                        currency="UAH",
-                        status="active"
-                    )
-                    db.add(result)
-                    results_count += 1
-            
-            elif rule.code == "PIT":
-                # Знайти BASE_SALARY для цього працівника в поточному документі
-                base_salary = db.query(AccrualResult).filter(
-                    AccrualResult.document_id == accrual_doc.id,
-                    AccrualResult.employee_id == employee.id,
-                    AccrualResult.rule_code == "BASE_SALARY",
-                    AccrualResult.status == "active"
-                ).first()
-                
-                if base_salary:
-                    pit_amount = base_salary.amount * 0.18
-                    result = AccrualResult(
-                        document_id=accrual_doc.id,
-                        employee_id=employee.id,
-                        rule_id=rule.id,
-                        rule_code=rule.code,
-                        amount=-pit_amount,  # Утримання - негативне
-                        calculation_base=base_salary.amount,
-                        currency="UAH",
-                        status="active"
-                    )
-                    db.add(result)
-                    results_count += 1
-            
-            elif rule.code == "WAR_TAX":
-                # Знайти BASE_SALARY для цього працівника
-                base_salary = db.query(AccrualResult).filter(
-                    AccrualResult.document_id == accrual_doc.id,
-                    AccrualResult.employee_id == employee.id,
-                    AccrualResult.rule_code == "BASE_SALARY",
-                    AccrualResult.status == "active"
-                ).first()
-                
-                if base_salary:
-                    war_tax_amount = base_salary.amount * 0.015
-                    result = AccrualResult(
-                        document_id=accrual_doc.id,
-                        employee_id=employee.id,
-                        rule_id=rule.id,
-                        rule_code=rule.code,
-                        amount=-war_tax_amount,  # Утримання - негативне
-                        calculation_base=base_salary.amount,
-                        currency="UAH",
-                        status="active"
-                    )
-                    db.add(result)
-                    results_count += 1
+    document = db.get(AccrualDocument, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    if document.status not in ("draft", "in_review"):
+        raise HTTPException(status_code=400, detail=f"Document in {document.status} status cannot be approved")
+    
+    document.status = "approved"
+    document.approved_date = datetime.now(timezone.utc)
+    document.approved_by = approved_by
+    sync_document_summary(db, document.id)
+    db.commit()
+    
+    return {
+        "document_id": document.id,
+        "document_number": document.document_number,
+        "status": document.status,
+        "message": "Document approved"
+    }
+
+@router.post("/{document_id}/cancel")
+def cancel_document(
+    document_id: int,
+    cancelled_by: str = "system",
+    db: Session = Depends(get_db)
+):
+    """Скасувати документ нарахування разом з його результатами"""
+    
+    document = db.get(AccrualDocument, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
     
+    if document.status == "cancelled":
+        raise HTTPException(status_code=400, detail="Document is already cancelled")
+    
+    # Результати не видаляються - лише змінюється статус
+    results_cancelled = db.execute(
+        update(AccrualResult)
+        .where(AccrualResult.document_id == document.id, AccrualResult.status == "active")
+        .values(status="cancelled")
+    ).rowcount
+    
+    document.status = "cancelled"
+    document.cancelled_date = datetime.now(timezone.utc)
+    document.cancelled_by = cancelled_by
+    # Скасовані результати випадають зі зведення
+    sync_document_summary(db, document.id)
     db.commit()
-    db.refresh(accrual_doc)
     
     return {
-        "document_id": accrual_doc.id,
-        "document_number": accrual_doc.document_number,
-        "status": accrual_doc.status,
-        "employees_processed": len(employees),
-        "results_created": results_count,
-        "message": "Calculation completed successfully"
+        "document_id": document.id,
+        "document_number": document.document_number,
+        "status": document.status,
+        "results_cancelled": results_cancelled,
+        "message": "Document cancelled"
     }
 
 @router.get("/{document_id}")
 async def get_calculation_results(
     document_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Отримати результати розрахунку"""
     
-    document = db.get(AccrualDocument, document_id)
+    document = await db.get(
+        AccrualDocument, document_id,
+        options=[
+            joinedload(AccrualDocument.period),
+            joinedload(AccrualDocument.template),
+            selectinload(AccrualDocument.results).options(
+                joinedload(AccrualResult.employee),
+                joinedload(AccrualResult.rule)
+            )
+        ]
+    )
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Групувати результати по працівниках
     results_by_employee = {}
-    for result in document.accrual_results:
+    for result in document.results:
         if result.employee_id not in results_by_employee:
             results_by_employee[result.employee_id] = {
                 "employee": {
@@ -203,7 +206,7 @@ async def get_calculation_results(
         
         results_by_employee[result.employee_id]["results"].append({
             "rule_code": result.rule_code,
-            "rule_name": result.rule.name,
+            "rule_name": result.rule.name if result.rule else None,
             "amount": float(result.amount),
             "calculation_base": float(result.calculation_base) if result.calculation_base else None,
             "status": result.status
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Optional
+from app.core.database import get_async_db
 from app.models import Employee, Position
+from app.services.pagination import TOTAL_EXACT, TOTAL_NONE, count_total_async, fetch_page_async
 from sqlalchemy import select
 
 router = APIRouter()
@@ -11,17 +13,44 @@ router = APIRouter()
 async def get_employees(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    after_id: Optional[int] = None,
+    total: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Отримати список працівників"""
-    employees = db.execute(
-        select(Employee)
-        .offset(skip)
-        .limit(limit)
-    ).scalars().all()
+    """
+    Отримати список працівників.
+
+    Наступна сторінка - after_id=next_after_id (без OFFSET).
+    total: exact, estimate або none; за замовчуванням рахується лише на першій сторінці.
+    """
+    query = select(Employee)
+    
+    try:
+        total_count = await count_total_async(
+            db, query, total or (TOTAL_EXACT if after_id is None else TOTAL_NONE),
+            Employee.__tablename__
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = query.order_by(Employee.id)
+    if after_id is not None:
+        query = query.where(Employee.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    
+    # Позиції з підрозділами - одним запитом на всю сторінку
+    employees, has_more = await fetch_page_async(
+        db,
+        query.options(
+            selectinload(Employee.positions).joinedload(Position.organizational_unit)
+        ),
+        limit
+    )
     
     return {
-        "total": db.query(Employee).count(),
+        "total": total_count,
+        "next_after_id": employees[-1].id if has_more else None,
         "items": [
             {
                 "id": emp.id,
@@ -44,10 +73,19 @@ async def get_employees(
 @router.get("/{employee_id}")
 async def get_employee(
     employee_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Отримати деталі працівника"""
-    employee = db.get(Employee, employee_id)
+    employee = (await db.execute(
+        select(Employee)
+        .where(Employee.id == employee_id)
+        .options(
+            selectinload(Employee.positions).options(
+                joinedload(Position.organizational_unit),
+                selectinload(Position.contracts)
+            )
+        )
+    )).scalars().first()
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
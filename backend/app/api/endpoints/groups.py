@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import func, literal_column, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 from app.core.database import get_db
 from app.models import Group
+from app.services.group_hierarchy import (
+    add_to_closure,
+    ancestors_query,
+    descendants_query,
+    move_in_closure,
+    refresh_subtree_paths
+)
+from app.services.group_tree_cache import etag_matches, group_tree_cache
+from app.services.pagination import TOTAL_NONE, after_key, count_total, decode_cursor, encode_cursor, fetch_page
 
 router = APIRouter(prefix="/groups", tags=["groups"])
 
@@ -27,6 +37,7 @@ class GroupUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     group_type: Optional[str] = None
+    parent_id: Optional[int] = None
     is_active: Optional[bool] = None
 
 
@@ -47,21 +58,29 @@ class GroupTreeNode(GroupResponse):
 # Для рекурсії
 GroupTreeNode.model_rebuild()
 
+group_tree_adapter = TypeAdapter(List[GroupTreeNode])
+
 
 # ==================== Endpoints ====================
 
 @router.get("/", response_model=List[GroupResponse])
 def get_groups(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
     group_type: Optional[str] = None,
     is_active: Optional[bool] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Отримати список всіх груп
+    Отримати список всіх груп (за full_path).
+
+    Наступна сторінка - cursor із заголовка X-Next-Cursor (без OFFSET).
+    total=exact|estimate повертає кількість у заголовку X-Total-Count.
     """
-    query = db.query(Group)
+    query = select(Group)
     
     if group_type:
         query = query.filter(Group.group_type == group_type)
@@ -69,17 +88,57 @@ def get_groups(
     if is_active is not None:
         query = query.filter(Group.is_active == is_active)
     
-    groups = query.order_by(Group.full_path).offset(skip).limit(limit).all()
+    try:
+        total_count = count_total(
+            db, query, total or TOTAL_NONE,
+            Group.__tablename__ if not group_type and is_active is None else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Той самий вираз, що й в індексі idx_groups_full_path_id
+    sort_key = (func.coalesce(Group.full_path, literal_column("''")), Group.id)
+    query = query.order_by(*sort_key)
+    if cursor:
+        try:
+            query = after_key(query, sort_key, decode_cursor(cursor, len(sort_key)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif skip:
+        query = query.offset(skip)
+    
+    groups, has_more = fetch_page(db, query, limit)
+    
+    if has_more:
+        last = groups[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([last.full_path or '', last.id])
+    if total_count is not None:
+        response.headers["X-Total-Count"] = str(total_count)
     return groups
 
 
 @router.get("/tree", response_model=List[GroupTreeNode])
 def get_groups_tree(
     group_type: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
-    Отримати дерево груп
+    Отримати дерево груп.
+
+    Дерево кешується в пам'яті; якщо If-None-Match збігається з ETag
+    кешованого дерева - 304 без звернення до БД.
+    """
+    cached = group_tree_cache.get_or_build(group_type, lambda: build_groups_tree(db, group_type))
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers={"ETag": cached.etag})
+    
+    return Response(content=cached.body, media_type="application/json", headers={"ETag": cached.etag})
+
+
+def build_groups_tree(db: Session, group_type: Optional[str]) -> bytes:
+    """
+    Побудувати дерево активних груп і серіалізувати в JSON
     """
     query = db.query(Group).filter(Group.is_active == True)
     
@@ -89,7 +148,7 @@ def get_groups_tree(
     all_groups = query.order_by(Group.level, Group.id).all()
     
     # Побудувати дерево
-    groups_dict = {g.id: GroupTreeNode.from_orm(g) for g in all_groups}
+    groups_dict = {g.id: GroupTreeNode.model_validate(g) for g in all_groups}
     
     root_groups = []
     for group in all_groups:
@@ -101,7 +160,7 @@ def get_groups_tree(
             if parent:
                 parent.children.append(node)
     
-    return root_groups
+    return group_tree_adapter.dump_json(root_groups)
 
 
 @router.get("/{group_id}", response_model=GroupResponse)
@@ -115,6 +174,36 @@ def get_group(group_id: int, db: Session = Depends(get_db)):
     return group
 
 
+@router.get("/{group_id}/descendants", response_model=List[GroupResponse])
+def get_group_descendants(
+    group_id: int,
+    is_active: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Отримати всі дочірні групи на будь-якій глибині
+    """
+    if not db.get(Group, group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    query = descendants_query(group_id)
+    if is_active is not None:
+        query = query.where(Group.is_active == is_active)
+    
+    return db.execute(query).scalars().all()
+
+
+@router.get("/{group_id}/ancestors", response_model=List[GroupResponse])
+def get_group_ancestors(group_id: int, db: Session = Depends(get_db)):
+    """
+    Отримати всі батьківські групи (від кореня)
+    """
+    if not db.get(Group, group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    return db.execute(ancestors_query(group_id)).scalars().all()
+
+
 @router.get("/code/{code}", response_model=GroupResponse)
 def get_group_by_code(code: str, db: Session = Depends(get_db)):
     """
@@ -155,16 +244,30 @@ def create_group(group: GroupCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_group)
+    db.flush()  # Отримати ID групи
+    
+    add_to_closure(db, db_group)
+    
     db.commit()
+    group_tree_cache.invalidate()
     db.refresh(db_group)
     
     return db_group
 
 
 @router.patch("/{group_id}", response_model=GroupResponse)
-def update_group(group_id: int, group: GroupUpdate, db: Session = Depends(get_db)):
+def update_group(
+    group_id: int,
+    group: GroupUpdate,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """
-    Оновити групу
+    Оновити групу.
+
+    Зміна назви або батька (parent_id, null - в корінь) перераховує full_path
+    і level всього піддерева одним запитом; кількість оновлених груп -
+    в заголовку X-Affected-Rows.
     """
     db_group = db.query(Group).filter(Group.id == group_id).first()
     if not db_group:
@@ -173,20 +276,34 @@ def update_group(group_id: int, group: GroupUpdate, db: Session = Depends(get_db
     # Оновити поля
     update_data = group.model_dump(exclude_unset=True)
     
+    # Перенесення в інше місце дерева
+    moved = 'parent_id' in update_data and update_data['parent_id'] != db_group.parent_id
+    if moved:
+        new_parent_id = update_data['parent_id']
+        if new_parent_id is not None:
+            parent = db.query(Group).filter(Group.id == new_parent_id).first()
+            if not parent:
+                raise HTTPException(status_code=404, detail="Parent group not found")
+        try:
+            move_in_closure(db, group_id, new_parent_id)
+        except ValueError as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+    
     for field, value in update_data.items():
         setattr(db_group, field, value)
     
-    # Якщо змінилась назва - оновити full_path
-    if 'name' in update_data:
-        if db_group.parent_id:
-            parent = db.query(Group).filter(Group.id == db_group.parent_id).first()
-            db_group.full_path = f"{parent.full_path} → {db_group.name}"
-        else:
-            db_group.full_path = db_group.name
+    # Якщо змінилась назва або батько - оновити full_path піддерева
+    affected = 0
+    if 'name' in update_data or moved:
+        db.flush()
+        affected = refresh_subtree_paths(db, group_id)
     
     db.commit()
+    group_tree_cache.invalidate()
     db.refresh(db_group)
     
+    response.headers["X-Affected-Rows"] = str(affected)
     return db_group
 
 
@@ -207,5 +324,6 @@ def delete_group(group_id: int, db: Session = Depends(get_db)):
     # Soft delete
     db_group.is_active = False
     db.commit()
+    group_tree_cache.invalidate()
     
     return None
\ No newline at end of file
@@ -0,0 +1,118 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+from app.core.database import get_db, BatchSessionLocal
+from app.core.config import settings
+from app.models import Employee
+from app.api.endpoints.calculations import (
+    CalculationRequest,
+    get_run_inputs,
+    ensure_document_is_new
+)
+from app.services.jobs import job_manager, Job
+from app.services.accrual_calculation import run_period_calculation
+from app.services.payroll_engine import iter_payslips
+
+router = APIRouter()
+
+
+def _job_response(job: Job):
+    return {
+        **job.to_dict(),
+        "status_url": f"/api/jobs/{job.id}",
+        "result_url": f"/api/jobs/{job.id}/result"
+    }
+
+
+@router.post("/payroll/calculate-all", status_code=202)
+def submit_calculate_all(calculation_date: str = "2024-01-15"):
+    """Запустити розрахунок зарплати всіх працівників у фоні"""
+    try:
+        datetime.fromisoformat(calculation_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid calculation_date")
+
+    def work(job: Job):
+        db = BatchSessionLocal()
+        try:
+            job.set_total(db.query(Employee).filter(Employee.is_active == True).count())
+
+            results = []
+            for payslip in iter_payslips(db, calculation_date, settings.PAYROLL_STREAM_CHUNK):
+                results.append(payslip)
+                job.advance(errors=1 if "error" in payslip else 0)
+
+            return {
+                "calculation_date": calculation_date,
+                "total_employees": len(results),
+                "results": results
+            }
+        finally:
+            db.close()
+
+    job = job_manager.submit("payroll.calculate_all", {"calculation_date": calculation_date}, work)
+    return _job_response(job)
+
+
+@router.post("/calculations/run", status_code=202)
+def submit_calculation_run(
+    request: CalculationRequest,
+    db: Session = Depends(get_db)
+):
+    """Запустити розрахунок періоду за шаблоном у фоні"""
+
+    # Помилки запиту повертаються одразу, до постановки в чергу
+    period, _ = get_run_inputs(db, request)
+    ensure_document_is_new(db, period)
+
+    def work(job: Job):
+        job_db = BatchSessionLocal()
+        try:
+            job_period, job_template = get_run_inputs(job_db, request)
+            return run_period_calculation(
+                job_db,
+                job_period,
+                job_template,
+                progress=lambda employee: job.advance(),
+                on_start=job.set_total
+            )
+        finally:
+            job_db.close()
+
+    job = job_manager.submit("calculations.run", request.model_dump(), work)
+    return _job_response(job)
+
+
+@router.get("/")
+def get_jobs():
+    """Список фонових задач"""
+    return {
+        "items": [job.to_dict() for job in job_manager.list()]
+    }
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    """Статус і прогрес фонової задачі"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return _job_response(job)
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    """Результат завершеної фонової задачі"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not job.is_finished:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    if job.error:
+        raise HTTPException(status_code=500, detail=job.error)
+
+    return job.result
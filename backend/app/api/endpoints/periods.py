@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from pydantic import BaseModel
 from datetime import date
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.models import CalculationPeriod, OrganizationalUnit, Employee
+from app.services.conditions_snapshot import PeriodSnapshot
+from app.services.pagination import TOTAL_EXACT, TOTAL_NONE, count_total_async, fetch_page_async
 
 router = APIRouter()
 
@@ -21,13 +25,41 @@ class PeriodCreate(BaseModel):
 async def get_periods(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    after_id: Optional[int] = None,
+    total: Optional[str] = None,
+    parent_period_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Отримати список періодів"""
-    periods = db.query(CalculationPeriod).offset(skip).limit(limit).all()
+    """
+    Отримати список періодів.
+
+    Наступна сторінка - after_id=next_after_id (без OFFSET).
+    total: exact, estimate або none; за замовчуванням рахується лише на першій сторінці.
+    parent_period_id - лише підперіоди (розбиття) цього періоду.
+    """
+    query = select(CalculationPeriod)
+    if parent_period_id is not None:
+        query = query.where(CalculationPeriod.parent_period_id == parent_period_id)
+    
+    try:
+        total_count = await count_total_async(
+            db, query, total or (TOTAL_EXACT if after_id is None else TOTAL_NONE),
+            CalculationPeriod.__tablename__ if parent_period_id is None else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = query.order_by(CalculationPeriod.id)
+    if after_id is not None:
+        query = query.where(CalculationPeriod.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    
+    periods, has_more = await fetch_page_async(db, query, limit)
     
     return {
-        "total": db.query(CalculationPeriod).count(),
+        "total": total_count,
+        "next_after_id": periods[-1].id if has_more else None,
         "items": [
             {
                 "id": period.id,
@@ -37,6 +69,8 @@ async def get_periods(
                 "end_date": period.end_date.isoformat(),
                 "period_type": period.period_type,
                 "status": period.status,
+                "parent_period_id": period.parent_period_id,
+                "split_reason": period.split_reason,
                 "created_by": period.created_by
             }
             for period in periods
@@ -44,7 +78,7 @@ async def get_periods(
     }
 
 @router.post("/")
-async def create_period(
+def create_period(
     period: PeriodCreate,
     db: Session = Depends(get_db)
 ):
@@ -88,10 +122,13 @@ async def create_period(
 @router.get("/{period_id}")
 async def get_period(
     period_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Отримати деталі періоду"""
-    period = db.get(CalculationPeriod, period_id)
+    period = await db.get(
+        CalculationPeriod, period_id,
+        options=[selectinload(CalculationPeriod.accrual_documents)]
+    )
     if not period:
         raise HTTPException(status_code=404, detail="Period not found")
     
@@ -105,6 +142,8 @@ async def get_period(
         "status": period.status,
         "organizational_unit_id": period.organizational_unit_id,
         "employee_id": period.employee_id,
+        "parent_period_id": period.parent_period_id,
+        "split_reason": period.split_reason,
         "created_by": period.created_by,
         "accrual_documents": [
             {
@@ -115,3 +154,28 @@ async def get_period(
             for doc in period.accrual_documents
         ]
     }
+
+@router.get("/{period_id}/conditions")
+async def get_period_conditions(
+    period_id: int,
+    position_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Зафіксовані умови розрахунку позицій періоду (для аудиту)"""
+    period = await db.get(CalculationPeriod, period_id)
+    if not period:
+        raise HTTPException(status_code=404, detail="Period not found")
+    
+    snapshot = PeriodSnapshot.of(period)
+    
+    if position_id is not None:
+        conditions = snapshot.get(position_id)
+        if not conditions:
+            raise HTTPException(status_code=404, detail="No conditions snapshot for position")
+        return {"period_id": period.id, "position_id": position_id, **conditions}
+    
+    return {
+        "period_id": period.id,
+        "positions_count": len(snapshot.positions),
+        "positions": snapshot.positions
+    }
@@ -1,17 +1,305 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.instrumentation import (
+    instrument_engine,
+    metrics_registry,
+    record_pool_timeout,
+    record_pool_wait,
+    record_routing
+)
+
+logger = logging.getLogger(__name__)
+
+# Async-драйвери для синхронних URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Профілі engine (налаштування - Settings.DB_PROFILES)
+PROFILE_INTERACTIVE = "interactive"  # короткі запити API
+PROFILE_BATCH = "batch"  # розрахунки періодів і фонові задачі
+PROFILE_REPORTING = "reporting"  # важкі звіти і попередні розрахунки
+
+# Значення для ключів, не заданих у профілі
+PROFILE_DEFAULTS: Dict[str, Any] = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": -1,
+    "pool_pre_ping": True,
+    "statement_timeout_ms": 0,
+}
+
+
+class _TimedPoolMixin:
+    """
+    Міряє час очікування з'єднання з пулу (профіль - logging_name пулу)
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            record_pool_timeout(getattr(self, "logging_name", None) or "default")
+            raise
+        record_pool_wait(getattr(self, "logging_name", None) or "default", time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def profile_options(profile: str) -> Dict[str, Any]:
+    if profile not in settings.DB_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+    return {**PROFILE_DEFAULTS, **settings.DB_PROFILES[profile]}
+
+
+def _statement_timeout_args(url: str, timeout_ms: int, is_async: bool) -> Dict[str, Any]:
+    # statement_timeout встановлюється на рівні сесії PostgreSQL при підключенні
+    if not timeout_ms or make_url(url).get_backend_name() != "postgresql":
+        return {}
+    if is_async:
+        return {"server_settings": {"statement_timeout": str(timeout_ms)}}
+    return {"options": f"-c statement_timeout={timeout_ms}"}
+
+
+def _engine_kwargs(url: str, profile: str, is_async: bool) -> Dict[str, Any]:
+    options = profile_options(profile)
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": options["pool_size"],
+        "max_overflow": options["max_overflow"],
+        "pool_timeout": options["pool_timeout"],
+        "pool_recycle": options["pool_recycle"],
+        "pool_pre_ping": options["pool_pre_ping"],
+        "pool_logging_name": f"{profile}_async" if is_async else profile,
+        "connect_args": _statement_timeout_args(url, options["statement_timeout_ms"], is_async),
+        "echo": settings.SQL_ECHO,
+    }
+
+
+_engines: Dict[str, Engine] = {}
+
+
+def get_engine(profile: str = PROFILE_INTERACTIVE) -> Engine:
+    """
+    Engine профілю; створюється при першому зверненні
+    """
+    if profile not in _engines:
+        profile_engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL, profile, False))
+        instrument_engine(profile_engine)
+        metrics_registry.register_pool(profile, lambda: profile_engine.pool)
+        _engines[profile] = profile_engine
+    return _engines[profile]
+
+
+_replica_engines: Dict[str, List[Engine]] = {}
+
+
+def get_replica_engines(profile: str) -> List[Engine]:
+    """
+    Engine реплік (READ_DATABASE_URLS) з налаштуваннями пулу профілю
+    """
+    if profile not in _replica_engines:
+        replicas = []
+        for i, url in enumerate(settings.READ_DATABASE_URLS):
+            name = f"{profile}_replica{i}"
+            replica = create_engine(url, **{**_engine_kwargs(url, profile, False), "pool_logging_name": name})
+            instrument_engine(replica)
+            metrics_registry.register_pool(name, lambda replica=replica: replica.pool)
+            replicas.append(replica)
+        _replica_engines[profile] = replicas
+    return _replica_engines[profile]
+
+
+def dispose_engines() -> None:
+    """
+    Закрити пули всіх профілів (після fork з'єднання батька не використовуються)
+    """
+    for profile_engine in _engines.values():
+        profile_engine.dispose(close=False)
+    for replicas in _replica_engines.values():
+        for replica in replicas:
+            replica.dispose(close=False)
+
+
+_replica_counter = itertools.count()
+
+
+def primary_wal_lsn(primary: Engine) -> Optional[str]:
+    """
+    Поточна позиція WAL primary - спільна для всіх процесів межа свіжості (None - не PostgreSQL)
+    """
+    if primary.dialect.name != "postgresql":
+        return None
+    with primary.connect() as conn:
+        return conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+
+
+def replica_is_fresh(replica: Engine, lsn: Optional[str]) -> bool:
+    """
+    Чи відтворила репліка WAL до lsn (None - перевірка неможлива, не PostgreSQL)
+    """
+    if lsn is None or replica.dialect.name != "postgresql":
+        return True
+    with replica.connect() as conn:
+        return bool(conn.execute(
+            text(
+                "SELECT coalesce(pg_last_wal_replay_lsn() >= CAST(CAST(:lsn AS text) AS pg_lsn), NOT pg_is_in_recovery())"
+            ),
+            {"lsn": lsn}
+        ).scalar())
+
+
+def choose_replica(primary: Engine, replicas: Sequence[Engine]) -> Optional[Engine]:
+    """
+    Репліка (по колу), що вже відтворила все, закомічене на primary до початку сесії;
+    None - читати з primary
+    """
+    try:
+        lsn = primary_wal_lsn(primary)
+    except exc.DBAPIError as e:
+        logger.warning("Could not read primary WAL position: %s", e)
+        return None
+    start = next(_replica_counter)
+    for i in range(len(replicas)):
+        replica = replicas[(start + i) % len(replicas)]
+        try:
+            fresh = replica_is_fresh(replica, lsn)
+        except exc.DBAPIError as e:
+            logger.warning("Read replica %s unavailable: %s", replica.url.render_as_string(), e)
+            record_routing("unavailable")
+            continue
+        if fresh:
+            record_routing("replica")
+            return replica
+        record_routing("stale")
+    return None
+
+
+def _is_plain_read(clause) -> bool:
+    return bool(getattr(clause, "is_select", False)) and getattr(clause, "_for_update_arg", None) is None
+
+
+class RoutingSession(Session):
+    """
+    Сесія, що читає з реплік, поки нічого не записала.
+
+    SELECT без FOR UPDATE йдуть на репліку; flush, DML, текстові запити і
+    Session.connection() - на primary, і після першого такого запиту сесія
+    до кінця читає лише з primary (бачить власні зміни). Репліка вибирається
+    один раз на сесію і лише якщо вже відтворила поточну позицію WAL primary,
+    тобто бачить усі коміти всіх процесів, зроблені до початку читання.
+    """
+
+    def __init__(self, *args, replicas: Sequence[Engine] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = list(replicas)
+        self.pinned = not self.replicas
+        self._replica: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, *, clause=None, bind=None, **kw):
+        primary = super().get_bind(mapper, clause=clause, bind=bind, **kw)
+        if bind is not None:
+            return primary
+        if self._flushing or not _is_plain_read(clause):
+            self.pinned = True
+            return primary
+        if self.pinned:
+            return primary
+        if self._replica is None:
+            self._replica = choose_replica(primary, self.replicas)
+            if self._replica is None:
+                self.pinned = True
+                return primary
+        return self._replica
+
 
 # Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
-)
+engine = get_engine(PROFILE_INTERACTIVE)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Розрахунки завжди читають з primary: їхні вхідні дані фіксуються в документі,
+# а created_at документа - межа змін для наступного перерахунку
+BatchSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine(PROFILE_BATCH))
+# Звіти лише читають - з реплік
+ReportingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=get_engine(PROFILE_REPORTING),
+    class_=RoutingSession, replicas=get_replica_engines(PROFILE_REPORTING)
+)
+
+
+def async_database_url(url: str) -> str:
+    """
+    URL для async engine: ASYNC_DATABASE_URL або DATABASE_URL з async-драйвером
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Async engine (asyncpg, профіль interactive), створюється при першому зверненні
+    """
+    global _async_engine
+    if _async_engine is None:
+        url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+        _async_engine = create_async_engine(url, **_engine_kwargs(url, PROFILE_INTERACTIVE, True))
+        instrument_engine(_async_engine.sync_engine)
+        metrics_registry.register_pool(f"{PROFILE_INTERACTIVE}_async", lambda: _async_engine.sync_engine.pool)
+    return _async_engine
+
+
+_async_replica_engines: Optional[List[AsyncEngine]] = None
+
+
+def get_async_replica_engines() -> List[AsyncEngine]:
+    """
+    Async engine реплік (профіль interactive), створюються при першому зверненні
+    """
+    global _async_replica_engines
+    if _async_replica_engines is None:
+        _async_replica_engines = []
+        for i, replica_url in enumerate(settings.READ_DATABASE_URLS):
+            url = async_database_url(replica_url)
+            name = f"{PROFILE_INTERACTIVE}_async_replica{i}"
+            replica = create_async_engine(
+                url, **{**_engine_kwargs(url, PROFILE_INTERACTIVE, True), "pool_logging_name": name}
+            )
+            instrument_engine(replica.sync_engine)
+            metrics_registry.register_pool(name, lambda replica=replica: replica.sync_engine.pool)
+            _async_replica_engines.append(replica)
+    return _async_replica_engines
+
+
+# Async session factory (engine і репліки прив'язуються в get_async_db)
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
 
 # Base class for models
 Base = declarative_base()
@@ -23,3 +311,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Довгі розрахунки - окремий пул, щоб не забирати з'єднання в API
+def get_batch_db():
+    db = BatchSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_reporting_db():
+    db = ReportingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Async dependency для ендпоінтів, що лише читають дані
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    replicas = [replica.sync_engine for replica in get_async_replica_engines()]
+    async with AsyncSessionLocal(bind=get_async_engine(), replicas=replicas) as db:
+        yield db
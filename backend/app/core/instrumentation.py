@@ -0,0 +1,305 @@
+"""
+Інструментування запитів: кількість SQL-запитів, час БД і час обробки.
+
+- SQLAlchemy-події before/after_cursor_execute рахують запити поточного
+  HTTP-запиту (через contextvars, працює і в threadpool sync-ендпоінтів)
+- middleware додає заголовки X-DB-Query-Count, X-DB-Time-Ms, X-Handler-Time-Ms
+  і накопичує агрегати для /metrics (Prometheus text format)
+- запити понад QUERY_BUDGET позначаються заголовком і попередженням в лог
+- пули з'єднань звітують час очікування з'єднання (X-DB-Pool-Wait-Ms і метрики по профілях)
+- сесії з репліками рахують, куди пішли читання (репліка, primary через відставання)
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Межі гістограми часу обробки, секунди
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Межі гістограми очікування з'єднання з пулу, секунди
+POOL_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class RequestStats:
+    """
+    Лічильники SQL поточного HTTP-запиту
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+
+    def add_pool_wait(self, elapsed: float) -> None:
+        with self._lock:
+            self.pool_wait += elapsed
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(elapsed)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Підключити лічильники запитів до engine (повторний виклик нічого не робить)
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RouteMetrics:
+    """
+    Агрегати по одному маршруту
+    """
+
+    def __init__(self):
+        self.requests: Dict[int, int] = defaultdict(int)  # status -> count
+        self.over_budget = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.handler_seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class PoolMetrics:
+    """
+    Очікування з'єднань одного пулу
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.buckets = [0] * len(POOL_WAIT_BUCKETS)
+
+
+class MetricsRegistry:
+    """
+    Агрегати по маршрутах і пулах з'єднань для /metrics
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = defaultdict(RouteMetrics)
+        self._pools: Dict[str, PoolMetrics] = defaultdict(PoolMetrics)
+        # профіль -> функція, що повертає поточний пул (для gauge-метрик)
+        self._pool_sources: Dict[str, Callable[[], object]] = {}
+        self._routing: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def register_pool(self, profile: str, source: Callable[[], object]) -> None:
+        self._pool_sources[profile] = source
+
+    def observe_pool_wait(self, profile: str, seconds: float) -> None:
+        with self._lock:
+            metrics = self._pools[profile]
+            metrics.checkouts += 1
+            metrics.wait_seconds += seconds
+            for i, bound in enumerate(POOL_WAIT_BUCKETS):
+                if seconds <= bound:
+                    metrics.buckets[i] += 1
+
+    def observe_pool_timeout(self, profile: str) -> None:
+        with self._lock:
+            self._pools[profile].timeouts += 1
+
+    def observe_routing(self, target: str) -> None:
+        with self._lock:
+            self._routing[target] += 1
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        stats: RequestStats,
+        handler_seconds: float,
+        over_budget: bool
+    ) -> None:
+        with self._lock:
+            metrics = self._routes[(method, route)]
+            metrics.requests[status] += 1
+            metrics.queries += stats.queries
+            metrics.db_seconds += stats.db_time
+            metrics.handler_seconds += handler_seconds
+            if over_budget:
+                metrics.over_budget += 1
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if handler_seconds <= bound:
+                    metrics.buckets[i] += 1
+
+    def render(self) -> str:
+        """
+        Метрики у форматі Prometheus text exposition
+        """
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            lines: List[str] = []
+
+            def header(name: str, kind: str, help_text: str) -> None:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            header("http_requests_total", "counter", "HTTP requests by route and status")
+            for (method, route), m in routes:
+                for status, count in sorted(m.requests.items()):
+                    lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}')
+
+            header("http_request_duration_seconds", "histogram", "Handler time")
+            for (method, route), m in routes:
+                labels = _labels(method, route)
+                total = sum(m.requests.values())
+                for bound, count in zip(DURATION_BUCKETS, m.buckets):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {m.handler_seconds:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {total}")
+
+            header("db_queries_total", "counter", "SQL statements issued by requests")
+            for (method, route), m in routes:
+                lines.append(f"db_queries_total{{{_labels(method, route)}}} {m.queries}")
+
+            header("db_query_duration_seconds_total", "counter", "Time spent in SQL statements")
+            for (method, route), m in routes:
+                lines.append(f"db_query_duration_seconds_total{{{_labels(method, route)}}} {m.db_seconds:.6f}")
+
+            header("http_requests_over_query_budget_total", "counter", "Requests over QUERY_BUDGET statements")
+            for (method, route), m in routes:
+                lines.append(f"http_requests_over_query_budget_total{{{_labels(method, route)}}} {m.over_budget}")
+
+            pools = sorted(self._pools.items())
+
+            header("db_pool_wait_seconds", "histogram", "Time waiting for a pooled connection")
+            for profile, p in pools:
+                labels = f'profile="{profile}"'
+                for bound, count in zip(POOL_WAIT_BUCKETS, p.buckets):
+                    lines.append(f'db_pool_wait_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'db_pool_wait_seconds_bucket{{{labels},le="+Inf"}} {p.checkouts}')
+                lines.append(f"db_pool_wait_seconds_sum{{{labels}}} {p.wait_seconds:.6f}")
+                lines.append(f"db_pool_wait_seconds_count{{{labels}}} {p.checkouts}")
+
+            header("db_pool_timeouts_total", "counter", "Connection checkouts that hit pool_timeout")
+            for profile, p in pools:
+                lines.append(f'db_pool_timeouts_total{{profile="{profile}"}} {p.timeouts}')
+
+            header("db_session_routing_total", "counter", "Read sessions by chosen database")
+            for target, count in sorted(self._routing.items()):
+                lines.append(f'db_session_routing_total{{target="{target}"}} {count}')
+
+        # Поточний стан пулів
+        header("db_pool_checked_out", "gauge", "Connections currently checked out")
+        states = []
+        for profile, source in sorted(self._pool_sources.items()):
+            pool = source()
+            if hasattr(pool, "checkedout"):
+                states.append((profile, pool))
+                lines.append(f'db_pool_checked_out{{profile="{profile}"}} {pool.checkedout()}')
+        header("db_pool_size", "gauge", "Configured pool size")
+        for profile, pool in states:
+            lines.append(f'db_pool_size{{profile="{profile}"}} {pool.size()}')
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._pools.clear()
+            self._routing.clear()
+
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+metrics_registry = MetricsRegistry()
+
+
+def record_pool_wait(profile: str, seconds: float) -> None:
+    """
+    Час очікування з'єднання з пулу профілю (викликається пулом при checkout)
+    """
+    metrics_registry.observe_pool_wait(profile, seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add_pool_wait(seconds)
+
+
+def record_pool_timeout(profile: str) -> None:
+    metrics_registry.observe_pool_timeout(profile)
+
+
+def record_routing(target: str) -> None:
+    """
+    Куди сесія з репліками відправила читання: replica, stale (репліка відстає), unavailable
+    """
+    metrics_registry.observe_routing(target)
+
+
+async def instrumentation_middleware(request: Request, call_next):
+    """
+    HTTP middleware: лічильники SQL і час обробки запиту
+    """
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_stats.reset(token)
+    handler_seconds = time.perf_counter() - started
+
+    over_budget = 0 < settings.QUERY_BUDGET < stats.queries
+
+    response.headers["X-DB-Query-Count"] = str(stats.queries)
+    response.headers["X-DB-Time-Ms"] = f"{stats.db_time * 1000:.2f}"
+    response.headers["X-Handler-Time-Ms"] = f"{handler_seconds * 1000:.2f}"
+    response.headers["X-DB-Pool-Wait-Ms"] = f"{stats.pool_wait * 1000:.2f}"
+    if over_budget:
+        response.headers["X-DB-Query-Budget-Exceeded"] = "true"
+        logger.warning(
+            "%s %s issued %d SQL statements (budget %d)",
+            request.method, request.url.path, stats.queries, settings.QUERY_BUDGET
+        )
+
+    # Шаблон маршруту, а не конкретний шлях - щоб не роздувати кількість серій
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", None) or "unmatched"
+    metrics_registry.observe(request.method, route_path, response.status_code, stats, handler_seconds, over_budget)
+
+    return response
@@ -1,11 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 import os
 
 from app.api import api_router
 from app.core.config import settings
+from app.core.instrumentation import instrumentation_middleware, metrics_registry
+from app.services.jobs import job_manager
+from app.services.payroll_sharding import shard_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск і зупинка: спільний пул процесів розрахунку, фонові задачі
+    """
+    shard_pool.start()
+    print("Payroll Management System v2.0 started")
+    print("API Docs: http://localhost:8000/docs")
+    print("Test Rules: http://localhost:8000/test-rules")
+    try:
+        yield
+    finally:
+        job_manager.shutdown()
+        shard_pool.shutdown()
+        print("Shutting down...")
+
 
 app = FastAPI(
     title="Payroll Management System",
@@ -13,6 +36,7 @@ app = FastAPI(
     version="2.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -22,8 +46,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "ETag", "X-Next-Cursor", "X-Total-Count", "X-Affected-Rows",
+        "X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-Pool-Wait-Ms", "X-Handler-Time-Ms",
+        "X-DB-Query-Budget-Exceeded"
+    ],
 )
 
+# Лічильники SQL і час обробки запитів
+app.middleware("http")(instrumentation_middleware)
+
 # API Router
 app.include_router(api_router, prefix="/api")
 
@@ -57,6 +89,17 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Метрики запитів у форматі Prometheus
+    """
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/test-rules")
 async def test_rules_page():
     """
@@ -71,20 +114,3 @@ async def test_rules_page():
             "path": html_path
         }
 
-
-@app.on_event("startup")
-async def startup_event():
-    """
-    Виконується при запуску
-    """
-    print("Payroll Management System v2.0 started")
-    print("API Docs: http://localhost:8000/docs")
-    print("Test Rules: http://localhost:8000/test-rules")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """
-    Виконується при зупинці
-    """
-    print("Shutting down...")
\ No newline at end of file
@@ -6,6 +6,7 @@ from app.models.module1 import (
     CalculationTemplate,
     TemplateRule,
     Group,              # НОВЕ!
+    GroupClosure,
     Position,           # НОВЕ!
     PositionGroup,      # НОВЕ!
     ShiftSchedule,      # НОВЕ!
@@ -20,6 +21,7 @@ from app.models.module3 import (
     CalculationPeriod,
     AccrualDocument,
     AccrualResult,
+    AccrualSummary,
     ChangeRequest,
     SplitReason,        # НОВЕ!
 )
@@ -39,6 +41,7 @@ __all__ = [
     "CalculationTemplate",
     "TemplateRule",
     "Group",
+    "GroupClosure",
     "Position",
     "PositionGroup",
     "ShiftSchedule",
@@ -51,6 +54,7 @@ __all__ = [
     "CalculationPeriod",
     "AccrualDocument",
     "AccrualResult",
+    "AccrualSummary",
     "ChangeRequest",
     "SplitReason",
     # Module 4
@@ -1,7 +1,7 @@
 # Модуль 1: Структура Підприємства і Працівники
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Text, Date, Time, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Text, Date, Time, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from app.core.database import Base
 
@@ -159,10 +159,30 @@ class Group(Base):
     __table_args__ = (
         CheckConstraint('id != parent_id', name='groups_check'),
         CheckConstraint('level > 0', name='groups_level_check'),
+        # Ключ keyset-пагінації списку груп (GET /groups)
+        Index('idx_groups_full_path_id', func.coalesce(full_path, literal_column("''")), id),
     )
     
     def __repr__(self):
         return f"<Group(id={self.id}, code='{self.code}', name='{self.name}', level={self.level})>"
+
+
+class GroupClosure(Base):
+    """Closure table дерева груп: усі пари предок-нащадок (включно з depth = 0)"""
+    __tablename__ = "group_closure"
+    
+    ancestor_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+    
+    # Constraints
+    __table_args__ = (
+        CheckConstraint('depth >= 0', name='group_closure_depth_check'),
+        Index('idx_group_closure_descendant', 'descendant_id', 'depth'),
+    )
+    
+    def __repr__(self):
+        return f"<GroupClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, depth={self.depth})>"
 class OrganizationalUnit(Base):
     __tablename__ = "organizational_units"
 
@@ -334,6 +354,9 @@ class CalculationRule(Base):
     valid_from = Column(DateTime(timezone=True), nullable=False, index=True)
     valid_until = Column(DateTime(timezone=True), index=True)
     
+    # Версійність
+    version = Column(Integer, default=1, server_default="1")
+    
     # Статус
     is_active = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -2,9 +2,21 @@ from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, N
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime, time, timezone
 from app.core.database import Base
 
 
+def _period_start_datetime(context):
+    day = context.get_current_parameters().get("start_date")
+    return datetime.combine(day, time.min, tzinfo=timezone.utc) if day else None
+
+
+def _period_end_datetime(context):
+    # Кінець останнього дня періоду (23:59:59), як у міграції 002
+    day = context.get_current_parameters().get("end_date")
+    return datetime.combine(day, time(23, 59, 59), tzinfo=timezone.utc) if day else None
+
+
 class CalculationPeriod(Base):
     __tablename__ = "calculation_periods"
     
@@ -17,6 +29,9 @@ class CalculationPeriod(Base):
     # Дати періоду
     start_date = Column(Date, nullable=False, index=True)
     end_date = Column(Date, nullable=False, index=True)
+    # Точний час меж (міграція 002); за замовчуванням - з start_date/end_date
+    start_datetime = Column(DateTime(timezone=True), default=_period_start_datetime)
+    end_datetime = Column(DateTime(timezone=True), default=_period_end_datetime)
     
     # Тип періоду
     period_type = Column(String(20), nullable=False)
@@ -28,6 +43,11 @@ class CalculationPeriod(Base):
     # Статус
     status = Column(String(20), default="draft", nullable=False, index=True)
     
+    # Розбиття періоду
+    split_reason = Column(String(50))
+    parent_period_id = Column(Integer, ForeignKey("calculation_periods.id", ondelete="SET NULL"), index=True)
+    conditions_snapshot = Column(JSONB)  # Зафіксовані умови розрахунку позицій
+    
     # Метадані
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -36,6 +56,7 @@ class CalculationPeriod(Base):
     # Relationships
     organizational_unit = relationship("OrganizationalUnit")
     employee = relationship("Employee")
+    parent_period = relationship("CalculationPeriod", remote_side=[id], backref="sub_periods")
     accrual_documents = relationship("AccrualDocument", back_populates="period")
     payment_documents = relationship("PaymentDocument", back_populates="period")
     
@@ -126,6 +147,55 @@ class AccrualResult(Base):
         return f"<AccrualResult(id={self.id}, rule_code='{self.rule_code}', amount={self.amount})>"
 
 
+class AccrualSummary(Base):
+    """Зведення активних нарахувань для звітів (денормалізований рядок на AccrualResult).
+    Підтримується інкрементально по документу - app/services/accrual_summary.py"""
+    __tablename__ = "accrual_summary"
+    
+    result_id = Column(Integer, primary_key=True)  # accrual_results.id
+    
+    # Документ і період
+    document_id = Column(Integer, ForeignKey("accrual_documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    document_number = Column(String(50), nullable=False)
+    document_status = Column(String(20), nullable=False)
+    period_code = Column(String(50), nullable=False, index=True)
+    period_name = Column(String(255), nullable=False)
+    start_datetime = Column(DateTime(timezone=True))
+    end_datetime = Column(DateTime(timezone=True))
+    template_name = Column(String(255), nullable=False)
+    
+    # Працівник і позиція
+    employee_id = Column(Integer, nullable=False, index=True)
+    personnel_number = Column(String(50), nullable=False)
+    employee_name = Column(String(201))
+    position_id = Column(Integer)
+    position_name = Column(String(255))
+    employment_rate = Column(Numeric(5, 4))
+    
+    # Підрозділ
+    org_unit_id = Column(Integer)
+    org_unit_name = Column(String(255))
+    org_unit_code = Column(String(50))
+    
+    # Правило
+    rule_id = Column(Integer, nullable=False)
+    rule_code = Column(String(50), nullable=False)
+    rule_name = Column(String(255))
+    rule_type = Column(String(20))
+    rule_source_type = Column(String(20))
+    rule_source_id = Column(Integer)
+    
+    # Результат
+    amount = Column(Numeric(12, 2), nullable=False)
+    calculation_base = Column(Numeric(12, 2))
+    currency = Column(String(3), nullable=False)
+    
+    created_at = Column(DateTime(timezone=True))
+    
+    def __repr__(self):
+        return f"<AccrualSummary(result_id={self.result_id}, document_id={self.document_id}, amount={self.amount})>"
+
+
 class ChangeRequest(Base):
     __tablename__ = "change_requests"
     
@@ -0,0 +1,332 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    CalculationPeriod,
+    AccrualDocument,
+    CalculationTemplate,
+    Employee,
+    Position
+)
+from app.services.accrual_summary import sync_document_summary
+from app.services.accrual_writer import accrual_row, write_accrual_results
+from app.services.conditions_snapshot import PeriodSnapshot, conditions_part
+from app.services.period_splitter import PeriodSplitter, SubPeriod
+from app.services.payroll_engine import PayrollBatch
+from app.services.template_engine import TemplatePlan, rule_source
+
+
+def document_number_for(period: CalculationPeriod, sequence: int = 1) -> str:
+    return f"ACC-{period.period_code}-{sequence:03d}"
+
+
+def next_document_number(db: Session, period: CalculationPeriod) -> str:
+    """
+    Наступний вільний номер документа періоду (коригування - 002, 003, ...)
+    """
+    prefix = f"ACC-{period.period_code}-"
+    numbers = db.execute(
+        select(AccrualDocument.document_number).where(
+            AccrualDocument.document_number.like(f"{prefix}%")
+        )
+    ).scalars().all()
+    
+    sequences = [int(number[len(prefix):]) for number in numbers if number[len(prefix):].isdigit()]
+    return document_number_for(period, max(sequences, default=0) + 1)
+
+
+def create_accrual_document(
+    db: Session,
+    period: CalculationPeriod,
+    template: CalculationTemplate,
+    document_number: Optional[str] = None
+) -> AccrualDocument:
+    """
+    Створити документ нарахування для періоду
+    """
+    accrual_doc = AccrualDocument(
+        document_number=document_number or document_number_for(period),
+        period_id=period.id,
+        template_id=template.id,
+        organizational_unit_id=period.organizational_unit_id,
+        employee_id=period.employee_id,
+        status="draft",
+        calculation_date=datetime.utcnow(),
+        created_by="system"
+    )
+    
+    db.add(accrual_doc)
+    db.flush()  # Отримати ID документа
+    
+    return accrual_doc
+
+
+def select_employees(db: Session, period: CalculationPeriod) -> List[Employee]:
+    """
+    Отримати працівників для розрахунку за scope періоду
+    """
+    if period.employee_id:
+        employees = [db.get(Employee, period.employee_id)]
+    elif period.organizational_unit_id:
+        # v2.0: працівник належить підрозділу через свої позиції
+        employees = db.query(Employee).filter(
+            Employee.id.in_(
+                select(Position.employee_id).where(
+                    Position.organizational_unit_id == period.organizational_unit_id,
+                    Position.is_active == True
+                )
+            ),
+            Employee.is_active == True
+        ).order_by(Employee.id).all()
+    else:
+        employees = db.query(Employee).filter(Employee.is_active == True).order_by(Employee.id).all()
+    
+    return employees
+
+
+def load_splitter(
+    db: Session,
+    period: CalculationPeriod,
+    plan: TemplatePlan,
+    employees: List[Employee]
+) -> PeriodSplitter:
+    """
+    Підперіоди позицій працівників за правилами шаблону
+    """
+    return PeriodSplitter(
+        db,
+        period.start_date,
+        period.end_date,
+        employee_ids=[employee.id for employee in employees],
+        rule_codes=list(dict.fromkeys(step.code for step in plan.steps))
+    ).load()
+
+
+def sub_period_part(plan: TemplatePlan, position: Position, sub_period: SubPeriod) -> List[Any]:
+    """
+    Умови підперіоду позиції; крок без перевизначення - правило шаблону
+    """
+    conditions = sub_period.conditions
+    found = {item["rule"].code: item["rule"] for item in conditions.rules}
+    return conditions_part(
+        sub_period.start,
+        sub_period.end,
+        conditions.contract,
+        position,
+        conditions.group_ids,
+        [found.get(step.code, step.default_rule) for step in plan.steps]
+    )
+
+
+def sub_period_code(period: CalculationPeriod, position_id: int, number: int) -> str:
+    suffix = f"-{position_id}-{number}"
+    return period.period_code[:50 - len(suffix)] + suffix
+
+
+def save_sub_periods(db: Session, period: CalculationPeriod, batch: PayrollBatch, snapshot: PeriodSnapshot) -> int:
+    """
+    Зберегти підперіоди позицій, умови яких змінились (snapshot.changed),
+    дочірніми calculation_periods і повернути кількість створених.
+
+    Дочірній період - один підперіод однієї позиції (лише якщо позиція
+    розбита на кілька): parent_period_id - період розрахунку, split_reason -
+    причина межі, з якої підперіод починається, conditions_snapshot - знімок
+    умов цієї позиції лише за підперіод. Попередні підперіоди змінених позицій
+    видаляються.
+    """
+    if not snapshot.changed:
+        return 0
+
+    for child in period.sub_periods:
+        if any(int(position_id) in snapshot.changed for position_id in PeriodSnapshot.of(child).positions):
+            db.delete(child)
+
+    positions = {
+        position.id: position
+        for employee_positions in batch.positions_by_employee.values()
+        for position in employee_positions
+    }
+
+    children = []
+    for position_id in sorted(snapshot.changed):
+        entry = snapshot.get(position_id)
+        if entry is None or len(entry["parts"]) < 2 or position_id not in positions:
+            continue
+
+        position = positions[position_id]
+        for number, part in enumerate(entry["parts"], start=1):
+            start = datetime.fromisoformat(part["conditions"][0])
+            end = datetime.fromisoformat(part["conditions"][1])
+            reasons = part.get("reasons") or []
+
+            child_snapshot = PeriodSnapshot()
+            child_snapshot.update(position_id, [part["conditions"]], [reasons])
+
+            children.append(CalculationPeriod(
+                period_code=sub_period_code(period, position_id, number),
+                period_name=f"{period.period_name} ({position.position_code}, {number})"[:255],
+                # Кінець підперіоду не включно, end_date/end_datetime - включно
+                start_date=start.date(),
+                end_date=(end - timedelta(seconds=1)).date(),
+                start_datetime=start,
+                end_datetime=end - timedelta(seconds=1),
+                period_type=period.period_type,
+                organizational_unit_id=position.organizational_unit_id,
+                employee_id=position.employee_id,
+                status=period.status,
+                split_reason=reasons[0] if reasons else None,
+                parent_period_id=period.id,
+                conditions_snapshot=child_snapshot.to_dict(),
+                created_by="system"
+            ))
+
+    db.add_all(children)
+    return len(children)
+
+
+def calculate_rows(
+    plan: TemplatePlan,
+    batch: PayrollBatch,
+    period: CalculationPeriod,
+    document_id: Optional[int],
+    employees: List[Employee],
+    position_ids: Optional[Set[int]] = None,
+    progress: Optional[Callable[[Employee], None]] = None,
+    snapshot: Optional[PeriodSnapshot] = None,
+    skip_unchanged: bool = False,
+    splitter: Optional[PeriodSplitter] = None
+) -> List[Dict[str, Any]]:
+    """
+    Рядки AccrualResult для позицій працівників (лише position_ids, якщо задано)
+    
+    snapshot - фіксувати в ньому умови кожного підперіоду позиції (splitter);
+    з skip_unchanged позиції з тим самим хешем умов не перераховуються
+    (snapshot.unchanged).
+    """
+    if snapshot is not None and splitter is None:
+        raise ValueError("Conditions snapshot requires a period splitter")
+
+    rows = []
+    
+    for employee in employees:
+        for position in batch.positions_by_employee.get(employee.id, []):
+            if position_ids is not None and position.id not in position_ids:
+                continue
+            if period.organizational_unit_id and position.organizational_unit_id != period.organizational_unit_id:
+                continue
+            
+            contract = batch.contracts_by_position.get(position.id)
+            if not contract:
+                if snapshot is not None:
+                    snapshot.discard(position.id)
+                continue
+            
+            resolved = plan.resolve(position, batch.rule_index, batch.position_moment(position))
+            
+            if snapshot is not None:
+                sub_periods = splitter.split(position)
+                parts = [sub_period_part(plan, position, sub_period) for sub_period in sub_periods]
+                reasons = [sub_period.reasons for sub_period in sub_periods]
+                if not snapshot.update(position.id, parts, reasons) and skip_unchanged:
+                    continue
+            
+            for result in plan.execute(position, contract.base_rate, resolved=resolved):
+                source_type, source_id = rule_source(result.rule, result.level)
+                rows.append(accrual_row(
+                    document_id=document_id,
+                    position_id=position.id,
+                    employee_id=employee.id,
+                    organizational_unit_id=position.organizational_unit_id,
+                    rule_id=result.rule.id,
+                    rule_code=result.rule.code,
+                    rule_source_type=source_type,
+                    rule_source_id=source_id,
+                    amount=result.signed_amount,
+                    calculation_base=result.calculation_base
+                ))
+        
+        if progress:
+            progress(employee)
+    
+    return rows
+
+
+def load_batch(db: Session, period: CalculationPeriod, employees: List[Employee]) -> PayrollBatch:
+    """
+    Вхідні дані розрахунку: позиції, що діяли хоча б частину періоду;
+    контракти і правила - на кінець періоду (позиції, що закінчилась
+    раніше, - на її останній день)
+    """
+    return PayrollBatch(
+        db,
+        period.end_date.isoformat(),
+        employee_ids=[employee.id for employee in employees],
+        period_start=period.start_date
+    ).load()
+
+
+def execute_template(
+    db: Session,
+    document: AccrualDocument,
+    period: CalculationPeriod,
+    template: CalculationTemplate,
+    employees: List[Employee],
+    progress: Optional[Callable[[Employee], None]] = None
+) -> int:
+    """
+    Виконати правила шаблону для працівників і повернути кількість створених результатів
+    
+    План шаблону і всі вхідні дані (позиції, контракти, правила) завантажуються
+    наперед, цикл по працівниках працює лише з пам'яттю, а всі AccrualResult
+    документа записуються однією bulk-операцією в кінці.
+    """
+    plan = TemplatePlan.compile(db, template)
+    batch = load_batch(db, period, employees)
+    
+    # Умови першого розрахунку фіксуються в знімку періоду по підперіодах,
+    # підперіоди розбитих позицій - дочірніми періодами
+    snapshot = PeriodSnapshot()
+    splitter = load_splitter(db, period, plan, employees)
+    rows = calculate_rows(
+        plan, batch, period, document.id, employees,
+        progress=progress, snapshot=snapshot, splitter=splitter
+    )
+    snapshot.save(period)
+    save_sub_periods(db, period, batch, snapshot)
+    
+    return write_accrual_results(db, rows)
+
+
+def run_period_calculation(
+    db: Session,
+    period: CalculationPeriod,
+    template: CalculationTemplate,
+    progress: Optional[Callable[[Employee], None]] = None,
+    on_start: Optional[Callable[[int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Створити документ нарахування, розрахувати працівників періоду і зберегти результат
+    """
+    accrual_doc = create_accrual_document(db, period, template)
+    
+    employees = select_employees(db, period)
+    if on_start:
+        on_start(len(employees))
+    
+    results_count = execute_template(db, accrual_doc, period, template, employees, progress)
+    sync_document_summary(db, accrual_doc.id)
+    
+    db.commit()
+    db.refresh(accrual_doc)
+    
+    return {
+        "document_id": accrual_doc.id,
+        "document_number": accrual_doc.document_number,
+        "status": accrual_doc.status,
+        "employees_processed": len(employees),
+        "results_created": results_count,
+        "message": "Calculation completed successfully"
+    }
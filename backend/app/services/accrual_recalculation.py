@@ -0,0 +1,266 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_, select, union
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import (
+    AccrualDocument,
+    AccrualResult,
+    CalculationPeriod,
+    CalculationRule,
+    CalculationTemplate,
+    Contract,
+    Employee,
+    GroupClosure,
+    Position,
+    PositionGroup,
+    Timesheet
+)
+from app.services.accrual_calculation import (
+    calculate_rows,
+    create_accrual_document,
+    load_batch,
+    load_splitter,
+    next_document_number,
+    save_sub_periods,
+    select_employees
+)
+from app.services.accrual_summary import sync_document_summary
+from app.services.accrual_writer import accrual_row, write_accrual_results
+from app.services.conditions_snapshot import PeriodSnapshot
+from app.services.formula import to_money
+from app.services.template_engine import TemplatePlan
+
+
+NOTE_STORNO = "Сторно"
+NOTE_ADDITIONAL = "Донарахування"
+
+
+def last_document(db: Session, period: CalculationPeriod) -> Optional[AccrualDocument]:
+    """
+    Останній (не скасований) документ нарахування періоду
+    """
+    return db.execute(
+        select(AccrualDocument)
+        .where(
+            AccrualDocument.period_id == period.id,
+            AccrualDocument.status != "cancelled"
+        )
+        .order_by(AccrualDocument.id.desc())
+        .limit(1)
+    ).scalars().first()
+
+
+def _changed_since(since, *columns):
+    return or_(*(column > since for column in columns))
+
+
+def changed_position_ids(db: Session, since) -> Optional[Set[int]]:
+    """
+    Позиції, вхідні дані яких змінились після since.
+
+    Враховуються нові/змінені позиції, контракти, табелі, членство в групах
+    і нові правила (версії правил - окремі рядки): правило позиції зачіпає
+    позицію, групи - її учасників (з GROUP_RULE_INHERITANCE - і учасників
+    дочірніх груп), підрозділу - його позиції.
+    None - з'явилось глобальне правило, зачеплені всі позиції.
+    """
+    rules = db.execute(
+        select(
+            CalculationRule.position_id,
+            CalculationRule.group_id,
+            CalculationRule.organizational_unit_id
+        ).where(CalculationRule.created_at > since)
+    ).all()
+
+    if any(p is None and g is None and u is None for p, g, u in rules):
+        return None
+
+    rule_position_ids = {p for p, _, _ in rules if p is not None}
+    group_ids = {g for p, g, _ in rules if p is None and g is not None}
+    unit_ids = {u for p, g, u in rules if p is None and g is None and u is not None}
+
+    queries = [
+        select(Position.id).where(_changed_since(since, Position.created_at, Position.updated_at)),
+        select(Contract.position_id).where(_changed_since(since, Contract.created_at, Contract.updated_at)),
+        select(PositionGroup.position_id).where(PositionGroup.created_at > since),
+        select(Timesheet.position_id).where(_changed_since(since, Timesheet.created_at, Timesheet.updated_at)),
+    ]
+    if group_ids:
+        member_group_ids = group_ids
+        if settings.GROUP_RULE_INHERITANCE:
+            # Правило групи успадковують усі її нащадки (depth = 0 - сама група)
+            member_group_ids = select(GroupClosure.descendant_id).where(GroupClosure.ancestor_id.in_(group_ids))
+        queries.append(select(PositionGroup.position_id).where(PositionGroup.group_id.in_(member_group_ids)))
+    if unit_ids:
+        queries.append(select(Position.id).where(Position.organizational_unit_id.in_(unit_ids)))
+
+    position_ids = set(db.execute(union(*queries)).scalars().all())
+    return position_ids | rule_position_ids
+
+
+def current_amounts(
+    db: Session,
+    period: CalculationPeriod,
+    position_ids: Optional[Set[int]]
+) -> Dict[Tuple[int, str], List[Tuple[int, int, Optional[int], Decimal]]]:
+    """
+    Чинні суми періоду по (позиція, код правила) з усіх не скасованих документів:
+    (position_id, rule_code) -> [(rule_id, employee_id, organizational_unit_id, сума)]
+    """
+    query = (
+        select(
+            AccrualResult.position_id,
+            AccrualResult.rule_code,
+            AccrualResult.rule_id,
+            AccrualResult.employee_id,
+            AccrualResult.organizational_unit_id,
+            func.sum(AccrualResult.amount)
+        )
+        .join(AccrualDocument, AccrualDocument.id == AccrualResult.document_id)
+        .where(
+            AccrualDocument.period_id == period.id,
+            AccrualDocument.status != "cancelled",
+            AccrualResult.status == "active"
+        )
+        .group_by(
+            AccrualResult.position_id,
+            AccrualResult.rule_code,
+            AccrualResult.rule_id,
+            AccrualResult.employee_id,
+            AccrualResult.organizational_unit_id
+        )
+    )
+    if position_ids is not None:
+        query = query.where(AccrualResult.position_id.in_(position_ids))
+
+    amounts = defaultdict(list)
+    for position_id, rule_code, rule_id, employee_id, unit_id, amount in db.execute(query):
+        amounts[(position_id, rule_code)].append((rule_id, employee_id, unit_id, to_money(amount)))
+    return amounts
+
+
+def correction_rows(
+    current: Dict[Tuple[int, str], List[Tuple[int, int, Optional[int], Decimal]]],
+    new_rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Різниця між чинними і новими сумами: для кожного зміненого (позиція, правило)
+    сторно чинної суми і донарахування нової
+    """
+    new_by_key = {(row["position_id"], row["rule_code"]): row for row in new_rows}
+
+    rows = []
+    for key in sorted(current.keys() | new_by_key.keys(), key=lambda k: (k[0] or 0, k[1])):
+        old = [item for item in current.get(key, []) if item[3] != 0]
+        new = new_by_key.get(key)
+
+        if new is not None and len(old) == 1 and old[0][0] == new["rule_id"] and old[0][3] == new["amount"]:
+            continue
+        if new is None and not old:
+            continue
+
+        position_id, rule_code = key
+        for rule_id, employee_id, unit_id, amount in old:
+            rows.append(accrual_row(
+                position_id=position_id,
+                employee_id=employee_id,
+                organizational_unit_id=unit_id,
+                rule_id=rule_id,
+                rule_code=rule_code,
+                amount=-amount,
+                notes=NOTE_STORNO
+            ))
+
+        if new is not None and new["amount"] != 0:
+            rows.append({**new, "notes": NOTE_ADDITIONAL})
+
+    return rows
+
+
+def _affected_employees(db: Session, period: CalculationPeriod, position_ids: Optional[Set[int]]) -> List[Employee]:
+    if position_ids is None:
+        return select_employees(db, period)
+
+    query = select(Employee).where(
+        Employee.id.in_(select(Position.employee_id).where(Position.id.in_(position_ids)))
+    )
+    if period.employee_id:
+        query = query.where(Employee.id == period.employee_id)
+    return db.execute(query.order_by(Employee.id)).scalars().all()
+
+
+def recalculate_period(
+    db: Session,
+    period: CalculationPeriod,
+    template: CalculationTemplate
+) -> Dict[str, Any]:
+    """
+    Інкрементальний перерахунок періоду.
+
+    Перераховуються лише позиції, змінені після останнього документа періоду
+    і чий хеш умов відрізняється від знімка періоду; різниця з чинними сумами записується окремим коригуючим документом
+    (наступний номер) рядками сторно/донарахування. Якщо різниці немає,
+    документ не створюється.
+    """
+    previous = last_document(db, period)
+    if previous is None:
+        raise LookupError("No accrual document to recalculate, run calculation first")
+
+    position_ids = changed_position_ids(db, previous.created_at)
+    employees = _affected_employees(db, period, position_ids)
+
+    plan = TemplatePlan.compile(db, template)
+    batch = load_batch(db, period, employees)
+
+    # Позиції з тим самим хешем умов, що й у знімку періоду, не перераховуються
+    snapshot = PeriodSnapshot.of(period)
+    new_rows = calculate_rows(
+        plan, batch, period, None, employees, position_ids,
+        snapshot=snapshot, skip_unchanged=True, splitter=load_splitter(db, period, plan, employees)
+    )
+    current = {
+        key: amounts for key, amounts in current_amounts(db, period, position_ids).items()
+        if key[0] not in snapshot.unchanged
+    }
+    rows = correction_rows(current, new_rows)
+    snapshot.save(period)
+    save_sub_periods(db, period, batch, snapshot)
+
+    if not rows:
+        db.commit()
+        return {
+            "document_id": None,
+            "document_number": None,
+            "based_on": previous.document_number,
+            "positions_checked": len(position_ids) if position_ids is not None else None,
+            "positions_unchanged": len(snapshot.unchanged),
+            "employees_processed": len(employees),
+            "results_created": 0,
+            "message": "No changes since last calculation"
+        }
+
+    accrual_doc = create_accrual_document(db, period, template, next_document_number(db, period))
+    for row in rows:
+        row["document_id"] = accrual_doc.id
+
+    results_count = write_accrual_results(db, rows)
+    sync_document_summary(db, accrual_doc.id)
+
+    db.commit()
+    db.refresh(accrual_doc)
+
+    return {
+        "document_id": accrual_doc.id,
+        "document_number": accrual_doc.document_number,
+        "based_on": previous.document_number,
+        "status": accrual_doc.status,
+        "positions_checked": len(position_ids) if position_ids is not None else None,
+        "positions_unchanged": len(snapshot.unchanged),
+        "employees_processed": len(employees),
+        "results_created": results_count,
+        "message": "Recalculation completed successfully"
+    }
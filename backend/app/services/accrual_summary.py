@@ -0,0 +1,99 @@
+"""
+Інкрементальне зведення accrual_summary.
+
+Замість повного REFRESH materialized view кожна зміна документа нарахування
+перезаписує лише зріз цього документа (DELETE + INSERT ... SELECT) у тій самій
+транзакції, що й зміна - вартість пропорційна розміру документа, а не всій історії.
+"""
+from typing import List, Optional
+
+from sqlalchemy import Insert, Select, delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    AccrualDocument,
+    AccrualResult,
+    AccrualSummary,
+    CalculationPeriod,
+    CalculationRule,
+    CalculationTemplate,
+    Employee,
+    OrganizationalUnit,
+    Position
+)
+
+
+def summary_select(document_ids: Optional[List[int]] = None) -> Select:
+    """
+    Рядки зведення з accrual_results (ті самі колонки, що й у колишньому view)
+    """
+    query = (
+        select(
+            AccrualResult.id.label("result_id"),
+            AccrualDocument.id.label("document_id"),
+            AccrualDocument.document_number,
+            AccrualDocument.status.label("document_status"),
+            CalculationPeriod.period_code,
+            CalculationPeriod.period_name,
+            CalculationPeriod.start_datetime,
+            CalculationPeriod.end_datetime,
+            CalculationTemplate.name.label("template_name"),
+            Employee.id.label("employee_id"),
+            Employee.personnel_number,
+            (Employee.first_name + " " + Employee.last_name).label("employee_name"),
+            Position.id.label("position_id"),
+            Position.position_name,
+            Position.employment_rate,
+            OrganizationalUnit.id.label("org_unit_id"),
+            OrganizationalUnit.name.label("org_unit_name"),
+            OrganizationalUnit.code.label("org_unit_code"),
+            AccrualResult.rule_id,
+            AccrualResult.rule_code,
+            CalculationRule.name.label("rule_name"),
+            CalculationRule.rule_type,
+            AccrualResult.rule_source_type,
+            AccrualResult.rule_source_id,
+            AccrualResult.amount,
+            AccrualResult.calculation_base,
+            AccrualResult.currency,
+            AccrualResult.created_at
+        )
+        .select_from(AccrualDocument)
+        .join(CalculationPeriod, CalculationPeriod.id == AccrualDocument.period_id)
+        .join(CalculationTemplate, CalculationTemplate.id == AccrualDocument.template_id)
+        .join(AccrualResult, AccrualResult.document_id == AccrualDocument.id)
+        .join(Position, Position.id == AccrualResult.position_id)
+        .join(Employee, Employee.id == AccrualResult.employee_id)
+        .join(OrganizationalUnit, OrganizationalUnit.id == AccrualResult.organizational_unit_id)
+        .join(CalculationRule, CalculationRule.id == AccrualResult.rule_id)
+        .where(AccrualResult.status == "active")
+    )
+    if document_ids is not None:
+        query = query.where(AccrualDocument.id.in_(document_ids))
+    return query
+
+
+def _insert_from(query: Select) -> Insert:
+    columns = [column.name for column in query.selected_columns]
+    return insert(AccrualSummary).from_select(columns, query)
+
+
+def sync_document_summary(db: Session, document_id: int) -> int:
+    """
+    Перезаписати зріз зведення документа; повертає кількість рядків зрізу.
+
+    Викликається після запису результатів, затвердження або скасування документа,
+    до commit - зведення змінюється атомарно разом з документом.
+    """
+    db.flush()
+    db.execute(delete(AccrualSummary).where(AccrualSummary.document_id == document_id))
+    return db.execute(_insert_from(summary_select([document_id]))).rowcount
+
+
+def rebuild_summary(db: Session) -> int:
+    """
+    Повністю перебудувати зведення (після змін довідників: імен, підрозділів, правил)
+    """
+    db.flush()
+    db.execute(delete(AccrualSummary))
+    return db.execute(_insert_from(summary_select())).rowcount
@@ -0,0 +1,90 @@
+import csv
+import io
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import AccrualResult
+
+
+# Колонки accrual_results, які заповнює розрахунок (created_at - server default)
+ACCRUAL_COLUMNS = (
+    "document_id",
+    "position_id",
+    "employee_id",
+    "organizational_unit_id",
+    "rule_id",
+    "rule_code",
+    "rule_source_type",
+    "rule_source_id",
+    "amount",
+    "calculation_base",
+    "currency",
+    "status",
+    "notes",
+)
+
+WRITE_MODE_INSERT = "insert"
+WRITE_MODE_COPY = "copy"
+
+
+def accrual_row(**values: Any) -> Dict[str, Any]:
+    """
+    Рядок accrual_results з усіма колонками (відсутні - NULL / значення за замовчуванням)
+    """
+    row = {column: None for column in ACCRUAL_COLUMNS}
+    row["currency"] = "UAH"
+    row["status"] = "active"
+    row.update(values)
+    return row
+
+
+def write_accrual_results(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    mode: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> int:
+    """
+    Записати результати документа однією bulk-операцією в поточній транзакції.
+
+    insert - пакети INSERT ... VALUES по batch_size рядків;
+    copy - COPY FROM STDIN (лише PostgreSQL, інакше - insert).
+    """
+    if not rows:
+        return 0
+
+    mode = mode or settings.ACCRUAL_WRITE_MODE
+    if mode == WRITE_MODE_COPY and db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, rows)
+    else:
+        _insert_rows(db, rows, batch_size or settings.ACCRUAL_INSERT_BATCH)
+
+    return len(rows)
+
+
+def _insert_rows(db: Session, rows: List[Dict[str, Any]], batch_size: int) -> None:
+    statement = insert(AccrualResult.__table__)
+    for start in range(0, len(rows), batch_size):
+        db.execute(statement, rows[start:start + batch_size])
+
+
+def _copy_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # Порожнє значення без лапок - NULL у COPY ... CSV
+        writer.writerow(["" if row[column] is None else row[column] for column in ACCRUAL_COLUMNS])
+    buffer.seek(0)
+
+    # Та сама транзакція, що й у сесії
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {AccrualResult.__tablename__} ({', '.join(ACCRUAL_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
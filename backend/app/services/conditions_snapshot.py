@@ -0,0 +1,99 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.models import CalculationPeriod, CalculationRule, Contract, Position
+
+
+SNAPSHOT_VERSION = 2
+
+
+def conditions_part(
+    start: datetime,
+    end: datetime,
+    contract: Optional[Contract],
+    position: Position,
+    group_ids: Iterable[int],
+    rules: Iterable[CalculationRule]
+) -> List[Any]:
+    """
+    Компактний запис умов підперіоду позиції:
+    [start, end, contract_id, contract_type, base_rate, employment_rate, [group_ids], [[rule_id, version], ...]]
+
+    Без контракту в підперіоді contract_id, contract_type і base_rate - null.
+    """
+    return [
+        start.isoformat(),
+        end.isoformat(),
+        contract.id if contract else None,
+        contract.contract_type if contract else None,
+        str(contract.base_rate) if contract else None,
+        str(position.employment_rate),
+        sorted(group_ids),
+        [[rule.id, rule.version or 1] for rule in rules],
+    ]
+
+
+def conditions_hash(parts: List[Any]) -> str:
+    payload = json.dumps(parts, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class PeriodSnapshot:
+    """
+    Зафіксовані умови розрахунку позицій періоду (calculation_periods.conditions_snapshot).
+
+    {"version": 2, "positions": {"<position_id>": {"hash": "...", "parts": [{"hash": "...", "conditions": [...], "reasons": [...]}]}}}
+
+    parts - підперіоди позиції (PeriodSplitter), кожен зі своїм хешем умов;
+    хеш позиції - від хешів усіх її підперіодів. Позиція, хеш умов якої
+    не змінився, при повторному розрахунку пропускається. Знімки
+    попередніх версій ігноруються - позиції перераховуються.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        if data and data.get("version") == SNAPSHOT_VERSION:
+            self.positions = dict(data.get("positions") or {})
+        # Позиції поточного розрахунку з незміненими і зміненими умовами
+        self.unchanged: Set[int] = set()
+        self.changed: Set[int] = set()
+
+    @classmethod
+    def of(cls, period: CalculationPeriod) -> "PeriodSnapshot":
+        return cls(period.conditions_snapshot)
+
+    def get(self, position_id: int) -> Optional[Dict[str, Any]]:
+        return self.positions.get(str(position_id))
+
+    def update(self, position_id: int, parts: List[List[Any]], reasons: Optional[List[List[str]]] = None) -> bool:
+        """
+        Зафіксувати умови підперіодів позиції; False - умови ті самі, що й у знімку
+
+        reasons - причини розбиття кожного підперіоду (в хеш не входять).
+        """
+        hashed = [{"hash": conditions_hash(part), "conditions": part} for part in parts]
+        digest = conditions_hash([part["hash"] for part in hashed])
+        current = self.positions.get(str(position_id))
+        if current is not None and current["hash"] == digest:
+            self.unchanged.add(position_id)
+            return False
+
+        if reasons is not None:
+            for part, part_reasons in zip(hashed, reasons):
+                part["reasons"] = list(part_reasons)
+        self.positions[str(position_id)] = {"hash": digest, "parts": hashed}
+        self.changed.add(position_id)
+        return True
+
+    def discard(self, position_id: int) -> None:
+        if self.positions.pop(str(position_id), None) is not None:
+            self.changed.add(position_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": SNAPSHOT_VERSION, "positions": dict(self.positions)}
+
+    def save(self, period: CalculationPeriod) -> None:
+        # Новий об'єкт - щоб SQLAlchemy побачив зміну JSONB
+        period.conditions_snapshot = self.to_dict()
@@ -0,0 +1,187 @@
+import ast
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+
+from app.models import CalculationRule
+
+
+# Функції, дозволені у формулах правил
+ALLOWED_FUNCTIONS = {
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "round": round,
+}
+
+# Допустима кількість аргументів: (мінімум, максимум; None - без обмеження)
+FUNCTION_ARITY = {
+    "min": (2, None),
+    "max": (2, None),
+    "abs": (1, 1),
+    "round": (1, 2),
+}
+
+# Векторні аналоги для обчислення формули над масивом (лише двоаргументні min/max)
+VECTOR_FUNCTIONS = {
+    "min": np.minimum,
+    "max": np.maximum,
+    "abs": np.abs,
+}
+
+# Вузли, які не мають поелементної семантики в NumPy
+_SCALAR_ONLY_NODES = (ast.BoolOp, ast.Compare, ast.IfExp, ast.Not)
+
+# Точність колонок Numeric(12, 2)
+CENT = Decimal("0.01")
+
+_ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.UnaryOp, ast.UAdd, ast.USub, ast.Not,
+    ast.BoolOp, ast.And, ast.Or,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.IfExp,
+    ast.Call,
+    ast.Name, ast.Load,
+    ast.Constant,
+)
+
+
+class FormulaError(ValueError):
+    """Формула правила не пройшла валідацію"""
+
+
+class CompiledFormula:
+    """
+    Провалідована і скомпільована формула правила
+    """
+
+    def __init__(self, source: str, code, variables: FrozenSet[str], vectorizable: bool = False):
+        self.source = source
+        self.code = code
+        self.variables = variables
+        self.vectorizable = vectorizable
+
+    def evaluate(self, **values: Any) -> Any:
+        return eval(self.code, {"__builtins__": {}, **ALLOWED_FUNCTIONS}, values)
+
+    def evaluate_array(self, **columns: np.ndarray) -> np.ndarray:
+        """
+        Обчислити формулу один раз над масивами значень (float64).
+
+        Елементні операції NumPy дають ті самі IEEE-результати, що й
+        скалярне обчислення, тому результат збігається поелементно.
+        """
+        if not self.vectorizable:
+            raise FormulaError(f"Formula cannot be evaluated over arrays: {self.source}")
+        size = len(next(iter(columns.values()))) if columns else 1
+        with np.errstate(all="ignore"):
+            result = eval(self.code, {"__builtins__": {}, **VECTOR_FUNCTIONS}, columns)
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), (size,))
+
+    def __repr__(self):
+        return f"<CompiledFormula({self.source!r})>"
+
+
+def compile_formula(source: Optional[str]) -> CompiledFormula:
+    """
+    Розібрати формулу в AST, перевірити що вона містить лише арифметику,
+    порівняння і дозволені функції, та скомпілювати її
+    """
+    if not source or not source.strip():
+        raise FormulaError("Formula is empty")
+
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula syntax: {e.msg}")
+
+    variables = set()
+    vectorizable = True
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"Unsupported construct in formula: {type(node).__name__}")
+
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise FormulaError(f"Unsupported constant in formula: {node.value!r}")
+
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in ALLOWED_FUNCTIONS:
+                raise FormulaError("Only min, max, abs and round calls are allowed in formulas")
+            if node.keywords:
+                raise FormulaError("Keyword arguments are not allowed in formulas")
+            low, high = FUNCTION_ARITY[node.func.id]
+            if len(node.args) < low or (high is not None and len(node.args) > high):
+                raise FormulaError(f"Wrong number of arguments for {node.func.id}(): {len(node.args)}")
+            if node.func.id not in VECTOR_FUNCTIONS or (node.func.id != "abs" and len(node.args) != 2):
+                vectorizable = False
+
+        if isinstance(node, _SCALAR_ONLY_NODES):
+            vectorizable = False
+
+        if isinstance(node, ast.Name) and node.id not in ALLOWED_FUNCTIONS:
+            if node.id.startswith("_"):
+                raise FormulaError(f"Unsupported name in formula: {node.id}")
+            variables.add(node.id)
+
+    code = compile(tree, "<formula>", "eval")
+    return CompiledFormula(source, code, frozenset(variables), vectorizable)
+
+
+def to_money(value: Any) -> Decimal:
+    """
+    Округлити суму до Numeric(12, 2) так само, як це робить PostgreSQL (half away from zero)
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class FormulaCache:
+    """
+    Кеш скомпільованих формул за (rule_id, version).
+
+    Запис також перевіряється за текстом формули, тож зміна sql_code
+    без підняття версії теж призводить до перекомпіляції.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[Optional[int], Optional[int]], CompiledFormula] = {}
+
+    def get(self, rule: CalculationRule) -> CompiledFormula:
+        if rule.id is None:
+            return compile_formula(rule.sql_code)
+
+        key = (rule.id, rule.version)
+        compiled = self._entries.get(key)
+        if compiled is None or compiled.source != rule.sql_code:
+            compiled = compile_formula(rule.sql_code)
+            self._entries[key] = compiled
+        return compiled
+
+    def invalidate(self, rule_id: Optional[int] = None) -> None:
+        """
+        Скинути кеш для правила (або повністю, якщо rule_id не вказано)
+        """
+        if rule_id is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == rule_id]:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+formula_cache = FormulaCache()
+
+
+@event.listens_for(CalculationRule, "after_update")
+@event.listens_for(CalculationRule, "after_delete")
+def _invalidate_rule_formula(mapper, connection, target):
+    formula_cache.invalidate(target.id)
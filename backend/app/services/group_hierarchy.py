@@ -0,0 +1,160 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, literal, select, text
+from sqlalchemy.orm import Session, aliased
+
+from app.models import Group, GroupClosure
+
+
+def add_to_closure(db: Session, group: Group) -> None:
+    """
+    Додати нову групу в closure table: зв'язок із собою і з усіма предками батька
+    """
+    db.add(GroupClosure(ancestor_id=group.id, descendant_id=group.id, depth=0))
+
+    if group.parent_id is not None:
+        db.execute(
+            insert(GroupClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(
+                    GroupClosure.ancestor_id,
+                    literal(group.id),
+                    GroupClosure.depth + 1
+                ).where(GroupClosure.descendant_id == group.parent_id)
+            )
+        )
+
+
+def is_descendant(db: Session, group_id: int, candidate_id: int) -> bool:
+    """
+    Чи candidate_id - сама група або її нащадок
+    """
+    return db.execute(
+        select(GroupClosure.depth).where(
+            GroupClosure.ancestor_id == group_id,
+            GroupClosure.descendant_id == candidate_id
+        )
+    ).first() is not None
+
+
+def move_in_closure(db: Session, group_id: int, new_parent_id: Optional[int]) -> None:
+    """
+    Перенести піддерево групи під нового батька (None - в корінь).
+
+    Зв'язки піддерева зі старими предками видаляються, з новими - додаються
+    декартовим добутком (предки нового батька) x (піддерево). Перенесення
+    під власного нащадка - ValueError.
+    """
+    if new_parent_id is not None and is_descendant(db, group_id, new_parent_id):
+        raise ValueError("Cannot move group under itself or its descendant")
+
+    subtree = select(GroupClosure.descendant_id).where(GroupClosure.ancestor_id == group_id)
+
+    db.execute(
+        delete(GroupClosure).where(
+            GroupClosure.descendant_id.in_(subtree),
+            GroupClosure.ancestor_id.not_in(subtree)
+        ).execution_options(synchronize_session=False)
+    )
+
+    if new_parent_id is not None:
+        supertree = aliased(GroupClosure)
+        descendants = aliased(GroupClosure)
+        db.execute(
+            insert(GroupClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(
+                    supertree.ancestor_id,
+                    descendants.descendant_id,
+                    supertree.depth + descendants.depth + 1
+                ).join(
+                    descendants, descendants.ancestor_id == group_id
+                ).where(supertree.descendant_id == new_parent_id)
+            )
+        )
+
+
+# Рекурсивно перебудовує level і full_path групи та всього її піддерева;
+# оновлюються лише рядки, що справді змінились
+_REFRESH_SUBTREE_PATHS = text("""
+    WITH RECURSIVE tree(id, level, full_path) AS (
+        SELECT g.id,
+               COALESCE(p.level, 0) + 1,
+               CASE WHEN p.id IS NULL THEN g.name ELSE p.full_path || ' → ' || g.name END
+        FROM groups g
+        LEFT JOIN groups p ON p.id = g.parent_id
+        WHERE g.id = :group_id
+        UNION ALL
+        SELECT c.id, tree.level + 1, tree.full_path || ' → ' || c.name
+        FROM groups c
+        JOIN tree ON c.parent_id = tree.id
+    )
+    UPDATE groups
+    SET level = tree.level,
+        full_path = tree.full_path,
+        updated_at = CURRENT_TIMESTAMP
+    FROM tree
+    WHERE groups.id = tree.id
+      AND (groups.level IS DISTINCT FROM tree.level
+           OR groups.full_path IS DISTINCT FROM tree.full_path)
+    RETURNING groups.id
+""")
+
+
+def refresh_subtree_paths(db: Session, group_id: int) -> int:
+    """
+    Перерахувати full_path і level піддерева одним UPDATE; повертає кількість змінених рядків
+    """
+    return len(db.execute(_REFRESH_SUBTREE_PATHS, {"group_id": group_id}).all())
+
+
+def descendants_query(group_id: int, include_self: bool = False):
+    """
+    Усі нащадки групи одним індексованим запитом (ближчі - першими)
+    """
+    query = select(Group).join(
+        GroupClosure, GroupClosure.descendant_id == Group.id
+    ).where(GroupClosure.ancestor_id == group_id)
+
+    if not include_self:
+        query = query.where(GroupClosure.depth > 0)
+
+    return query.order_by(GroupClosure.depth, Group.id)
+
+
+def ancestors_query(group_id: int, include_self: bool = False):
+    """
+    Усі предки групи одним індексованим запитом (від кореня)
+    """
+    query = select(Group).join(
+        GroupClosure, GroupClosure.ancestor_id == Group.id
+    ).where(GroupClosure.descendant_id == group_id)
+
+    if not include_self:
+        query = query.where(GroupClosure.depth > 0)
+
+    return query.order_by(GroupClosure.depth.desc())
+
+
+def ancestor_ids(db: Session, group_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """
+    Предки кожної з груп: group_id -> [ancestor_id, ...] (ближчі - першими)
+    """
+    group_ids = list(set(group_ids))
+    if not group_ids:
+        return {}
+
+    rows = db.execute(
+        select(GroupClosure.descendant_id, GroupClosure.ancestor_id)
+        .where(
+            GroupClosure.descendant_id.in_(group_ids),
+            GroupClosure.depth > 0
+        )
+        .order_by(GroupClosure.descendant_id, GroupClosure.depth)
+    ).all()
+
+    ancestors: Dict[int, List[int]] = defaultdict(list)
+    for descendant_id, ancestor_id in rows:
+        ancestors[descendant_id].append(ancestor_id)
+    return ancestors
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class CachedTree:
+    """
+    Серіалізоване дерево груп (JSON) з ETag
+    """
+
+    def __init__(self, body: bytes, version: int):
+        self.body = body
+        self.version = version
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.created = time.monotonic()
+
+
+class GroupTreeCache:
+    """
+    In-process кеш дерева груп по group_type.
+
+    Кожна зміна груп (create/patch/delete) піднімає версію і скидає кеш.
+    Дерево, побудоване до зміни, в кеш не потрапляє. ETag - хеш JSON,
+    тож однакове дерево має той самий ETag і після перезапуску процесу.
+    Інші воркери про зміну не дізнаються, тому записи живуть не довше
+    GROUP_TREE_CACHE_TTL секунд.
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = settings.GROUP_TREE_CACHE_TTL if ttl is None else ttl
+        self.version = 0
+        self._entries: Dict[Optional[str], CachedTree] = {}
+        self._lock = threading.Lock()
+
+    def get(self, group_type: Optional[str]) -> Optional[CachedTree]:
+        entry = self._entries.get(group_type)
+        if entry is None or entry.version != self.version:
+            return None
+        if time.monotonic() - entry.created > self.ttl:
+            return None
+        return entry
+
+    def get_or_build(self, group_type: Optional[str], build: Callable[[], bytes]) -> CachedTree:
+        """
+        Дерево з кешу або побудоване build() (серіалізований JSON)
+        """
+        entry = self.get(group_type)
+        if entry is not None:
+            return entry
+
+        version = self.version
+        entry = CachedTree(build(), version)
+        if self.ttl > 0:
+            with self._lock:
+                # За час побудови групи могли змінитись
+                if version == self.version:
+                    self._entries[group_type] = entry
+        return entry
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Чи містить заголовок If-None-Match вказаний ETag (або *)
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+group_tree_cache = GroupTreeCache()
@@ -0,0 +1,148 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class Job:
+    """
+    Фонова задача з прогресом виконання
+    """
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = JOB_QUEUED
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.errors = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def set_total(self, total: int) -> None:
+        self.total = total
+
+    def advance(self, count: int = 1, errors: int = 0) -> None:
+        with self._lock:
+            self.processed += count
+            self.errors += errors
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self._started is None:
+            return 0.0
+        end = self._finished if self._finished is not None else time.monotonic()
+        return end - self._started
+
+    @property
+    def throughput(self) -> float:
+        """Оброблених працівників за секунду"""
+        elapsed = self.elapsed_seconds
+        return round(self.processed / elapsed, 2) if elapsed > 0 else 0.0
+
+    def _start(self) -> None:
+        self.status = JOB_RUNNING
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+
+    def _finish(self, status: str) -> None:
+        self._finished = time.monotonic()
+        self.finished_at = datetime.now(timezone.utc)
+        self.status = status
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": {
+                "total": self.total,
+                "processed": self.processed,
+                "errors": self.errors,
+                "percent": round(100.0 * self.processed / self.total, 1) if self.total else None,
+                "elapsed_seconds": round(self.elapsed_seconds, 3),
+                "throughput_per_second": self.throughput
+            },
+            "error": self.error
+        }
+
+
+class JobManager:
+    """
+    In-process черга фонових задач на пулі потоків.
+
+    Зберігає останні JOB_HISTORY_LIMIT задач; зовнішній брокер не потрібен.
+    """
+
+    def __init__(self, workers: int, history_limit: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="payroll-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._history_limit = history_limit
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, params: Dict[str, Any], func: Callable[[Job], Any]) -> Job:
+        """
+        Поставити задачу в чергу; func отримує Job для звітування про прогрес
+        """
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Any]) -> None:
+        job._start()
+        try:
+            job.result = func(job)
+            job._finish(JOB_COMPLETED)
+        except Exception as e:
+            job.error = str(e) or traceback.format_exc(limit=1)
+            job._finish(JOB_FAILED)
+
+    def _trim(self) -> None:
+        # Видаляти найстаріші завершені задачі понад ліміт
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(self._jobs) - self._history_limit)]:
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return list(reversed(self._jobs.values()))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_manager = JobManager(settings.JOB_WORKERS, settings.JOB_HISTORY_LIMIT)
@@ -0,0 +1,135 @@
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, Select, bindparam, cast, column, func, select, table, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+TOTAL_EXACT = "exact"  # COUNT(*) по запиту
+TOTAL_ESTIMATE = "estimate"  # pg_class.reltuples (лише для нефільтрованих списків)
+TOTAL_NONE = "none"  # без total
+TOTAL_MODES = (TOTAL_EXACT, TOTAL_ESTIMATE, TOTAL_NONE)
+
+# select(), а не text(): RoutingSession виконує його як звичайне читання (на репліці)
+_pg_class = table("pg_class", column("oid"), column("reltuples"))
+ESTIMATE_QUERY = select(cast(_pg_class.c.reltuples, BigInteger)).where(
+    _pg_class.c.oid == func.to_regclass(bindparam("table"))
+)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Непрозорий курсор зі значень ключа сортування останнього рядка сторінки
+    """
+    payload = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def after_key(query: Select, columns: Sequence[Any], values: Sequence[Any]) -> Select:
+    """
+    Рядки після курсора: (col1, col2, ...) > (v1, v2, ...).
+    Запит має бути відсортований за тими самими колонками.
+    """
+    if len(columns) == 1:
+        return query.where(columns[0] > values[0])
+    return query.where(tuple_(*columns) > tuple_(*values))
+
+
+def fetch_page(db: Session, query: Select, limit: int) -> Tuple[List[Any], bool]:
+    """
+    Сторінка з limit рядків і ознака, чи є наступна (читається limit + 1 рядок)
+    """
+    rows = db.execute(query.limit(limit + 1)).scalars().all()
+    return rows[:limit], len(rows) > limit
+
+
+def check_total_mode(mode: str) -> None:
+    if mode not in TOTAL_MODES:
+        raise ValueError(f"Unknown total mode: {mode}. Use one of: {', '.join(TOTAL_MODES)}")
+
+
+def count_statement(query: Select) -> Select:
+    return select(func.count()).select_from(query.order_by(None).subquery())
+
+
+def _estimate(value: Optional[int]) -> Optional[int]:
+    # reltuples = -1 - таблицю ще не аналізували
+    if value is None or value < 0:
+        return None
+    return int(value)
+
+
+def estimated_count(db: Session, table_name: str) -> Optional[int]:
+    """
+    Оцінка кількості рядків таблиці зі статистики PostgreSQL.
+    None - якщо оцінки немає (інша СУБД або таблицю ще не аналізували).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    return _estimate(db.execute(ESTIMATE_QUERY, {"table": table_name}).scalar())
+
+
+def count_total(
+    db: Session,
+    query: Select,
+    mode: str,
+    table_name: Optional[str] = None
+) -> Optional[int]:
+    """
+    total для списку за режимом exact/estimate/none.
+
+    estimate можливий лише для нефільтрованої таблиці (table_name);
+    інакше, або коли оцінки немає, рахується точно.
+    """
+    check_total_mode(mode)
+    if mode == TOTAL_NONE:
+        return None
+
+    if mode == TOTAL_ESTIMATE and table_name:
+        estimate = estimated_count(db, table_name)
+        if estimate is not None:
+            return estimate
+
+    return db.execute(count_statement(query)).scalar()
+
+
+async def fetch_page_async(db: AsyncSession, query: Select, limit: int) -> Tuple[List[Any], bool]:
+    """
+    fetch_page для AsyncSession
+    """
+    rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+    return rows[:limit], len(rows) > limit
+
+
+async def count_total_async(
+    db: AsyncSession,
+    query: Select,
+    mode: str,
+    table_name: Optional[str] = None
+) -> Optional[int]:
+    """
+    count_total для AsyncSession
+    """
+    check_total_mode(mode)
+    if mode == TOTAL_NONE:
+        return None
+
+    if mode == TOTAL_ESTIMATE and table_name and db.bind.dialect.name == "postgresql":
+        estimate = _estimate((await db.execute(ESTIMATE_QUERY, {"table": table_name})).scalar())
+        if estimate is not None:
+            return estimate
+
+    return (await db.execute(count_statement(query))).scalar()
@@ -0,0 +1,454 @@
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Employee, Position, Contract, CalculationRule
+from app.core.config import settings
+from app.services.formula import FormulaError, formula_cache
+from app.services.rule_finder import RuleIndex
+from app.services.rule_graph import BASE_SALARY, GROSS_SALARY, node_name, rule_graph
+
+
+# Коди правил, які застосовуються до кожної позиції
+RULE_CODES = ['PIT', 'MIL_TAX', 'ESV', 'IT_BONUS', 'CLASS_BONUS',
+              'YOUNG_BONUS', 'DEPUTY_BONUS', 'PERSONAL_BONUS',
+              'SOCIAL_BENEFIT', 'UNION_FEE']
+
+
+class NoActivePositionsError(LookupError):
+    """У працівника немає активних позицій на дату розрахунку"""
+
+    def __init__(self):
+        super().__init__("No active positions found")
+
+
+def calculate_rule(base_salary: Decimal, rule: CalculationRule) -> Decimal:
+    """
+    Виконати формулу правила (скомпільовану один раз і закешовану)
+    """
+    return evaluate_rule(rule, {BASE_SALARY: base_salary})
+
+
+def evaluate_rule(rule: CalculationRule, values: Dict[str, Decimal]) -> Decimal:
+    """
+    Виконати формулу правила над значеннями змінних
+    """
+    try:
+        formula = formula_cache.get(rule)
+        result = formula.evaluate(**{name: float(value) for name, value in values.items()})
+        return Decimal(str(result))
+    except Exception as e:
+        raise ValueError(f"Error calculating rule {rule.code}: {str(e)}")
+
+
+def employee_info(employee: Employee) -> Dict[str, Any]:
+    return {
+        "id": employee.id,
+        "personnel_number": employee.personnel_number,
+        "full_name": f"{employee.first_name} {employee.last_name}"
+    }
+
+
+def evaluate_column(
+    rule: CalculationRule,
+    contexts: Sequence[Dict[str, Decimal]],
+    vectorized: bool = True
+) -> List[Union[Decimal, ValueError]]:
+    """
+    Обчислити формулу правила для колонки контекстів (значень змінних).
+
+    Формули без змінних рахуються один раз; чисто арифметичні формули -
+    одним векторним проходом NumPy по колонці кожної змінної; решта (умови,
+    round, відсутні змінні, помилки на кшталт ділення на нуль) - поелементно,
+    з помилкою на місці відповідного контексту.
+    """
+    formula = None
+    try:
+        formula = formula_cache.get(rule)
+    except FormulaError:
+        pass
+
+    if formula is not None and contexts:
+        if not formula.variables:
+            try:
+                return [evaluate_rule(rule, {})] * len(contexts)
+            except ValueError as e:
+                return [e] * len(contexts)
+
+        if (
+            vectorized and formula.vectorizable
+            and all(formula.variables <= context.keys() for context in contexts)
+        ):
+            try:
+                column = formula.evaluate_array(**{
+                    name: np.array([float(context[name]) for context in contexts], dtype=np.float64)
+                    for name in formula.variables
+                })
+            except Exception:
+                # Помилка векторного проходу - поелементно, з помилкою на місці кожного контексту
+                column = None
+            if column is not None and np.isfinite(column).all():
+                return [Decimal(repr(amount)) for amount in column.tolist()]
+
+    results = []
+    for context in contexts:
+        try:
+            results.append(evaluate_rule(rule, context))
+        except ValueError as e:
+            results.append(e)
+    return results
+
+
+def evaluate_tasks(
+    tasks: List[Tuple[CalculationRule, Dict[str, Decimal]]],
+    vectorized: bool = True
+) -> List[Union[Decimal, ValueError]]:
+    """
+    Обчислити пари (правило, контекст), згрупувавши їх за правилом
+    """
+    columns: Dict[int, List[int]] = defaultdict(list)
+    for task_idx, (rule, _) in enumerate(tasks):
+        columns[id(rule)].append(task_idx)
+
+    results: List[Union[Decimal, ValueError]] = [None] * len(tasks)
+    for task_ids in columns.values():
+        rule = tasks[task_ids[0]][0]
+        amounts = evaluate_column(rule, [tasks[i][1] for i in task_ids], vectorized)
+        for task_idx, amount in zip(task_ids, amounts):
+            results[task_idx] = amount
+    return results
+
+
+class PositionSlip:
+    """Проміжний стан розрахунку однієї позиції"""
+
+    __slots__ = ("employee_id", "position", "base_salary", "found", "rules", "graph", "values", "error")
+
+    def __init__(self, employee_id: int, position: Position, base_salary: Decimal, found: List[Dict[str, Any]]):
+        self.employee_id = employee_id
+        self.position = position
+        self.base_salary = base_salary
+        self.found = found
+        self.rules = {node_name(item['rule'].code): item['rule'] for item in found}
+        # Обчислені вузли графа: base_salary, gross_salary і результати правил
+        self.values: Dict[str, Decimal] = {BASE_SALARY: base_salary}
+        self.error: Optional[ValueError] = None
+        try:
+            self.graph = rule_graph([item['rule'] for item in found], taxes_on_gross=True)
+        except ValueError as e:
+            self.graph = None
+            self.error = e
+
+    def tasks(self, generation: int) -> List[Tuple[str, CalculationRule, Dict[str, Decimal]]]:
+        """
+        Правила покоління графа з їх контекстами; gross_salary рахується тут же
+        """
+        if self.error is not None or generation >= len(self.graph.generations):
+            return []
+
+        tasks = []
+        for name in self.graph.generations[generation]:
+            if name == GROSS_SALARY:
+                self.values[GROSS_SALARY] = self.base_salary + sum(
+                    (self.values[accrual] for accrual in self.graph.accruals), Decimal(0)
+                )
+                continue
+
+            context = {
+                variable: self.values[source]
+                for variable, source in self.graph.bindings[name].items()
+                if source in self.values
+            }
+            tasks.append((name, self.rules[name], context))
+        return tasks
+
+    def prorate(self, fraction: Decimal) -> None:
+        """
+        Пропорційно зменшити всі обчислені суми (частка підперіоду в періоді)
+        """
+        self.base_salary *= fraction
+        for name in self.values:
+            self.values[name] *= fraction
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Розкласти обчислені вузли в розрахунковий лист (у порядку RULE_CODES)
+        """
+        accruals = []  # Нарахування
+        deductions = []  # Утримання
+        taxes = []  # Податки
+        total_tax = Decimal(0)
+        total_deductions = Decimal(0)
+
+        for found in self.found:
+            rule = found['rule']
+            amount = self.values[node_name(rule.code)]
+            item = {
+                "code": rule.code,
+                "name": rule.name,
+                "type": rule.rule_type,
+                "level": found['level'],
+                "source": found['source'],
+                "formula": rule.sql_code,
+                "amount": float(amount)
+            }
+
+            if rule.rule_type == 'accrual' or rule.rule_type == 'benefit':
+                accruals.append(item)
+            elif rule.rule_type == 'deduction':
+                deductions.append(item)
+                total_deductions += Decimal(str(item['amount']))
+            elif rule.rule_type == 'tax':
+                taxes.append(item)
+                total_tax += amount
+
+        gross_salary = self.values[GROSS_SALARY]
+
+        # Нетто зарплата
+        net_salary = gross_salary - total_tax - total_deductions
+
+        position = self.position
+        return {
+            "position": {
+                "id": position.id,
+                "code": position.position_code,
+                "name": position.position_name,
+                "employment_rate": float(position.employment_rate)
+            },
+            "base_salary": float(self.base_salary),
+            "accruals": accruals,
+            "gross_salary": float(gross_salary),
+            "taxes": taxes,
+            "deductions": deductions,
+            "total_tax": float(total_tax),
+            "total_deductions": float(total_deductions),
+            "net_salary": float(net_salary)
+        }
+
+
+def evaluate_slips(slips: Sequence["PositionSlip"], vectorized: bool = True) -> None:
+    """
+    Обійти графи правил усіх позицій по топологічних поколіннях.
+
+    Кожне правило покоління обчислюється один раз над колонкою контекстів
+    усіх позицій, що отримали це правило.
+    """
+    depth = max((len(slip.graph.generations) for slip in slips if slip.graph), default=0)
+    for generation in range(depth):
+        targets: List[Tuple[PositionSlip, str]] = []
+        tasks: List[Tuple[CalculationRule, Dict[str, Decimal]]] = []
+        for slip in slips:
+            for name, rule, context in slip.tasks(generation):
+                targets.append((slip, name))
+                tasks.append((rule, context))
+
+        for (slip, name), amount in zip(targets, evaluate_tasks(tasks, vectorized)):
+            if slip.error is not None:
+                continue
+            if isinstance(amount, Exception):
+                slip.error = amount
+                continue
+            slip.values[name] = amount
+
+
+class PayrollBatch:
+    """
+    Пакетний розрахунок зарплати.
+
+    Працівники, активні позиції, контракти, членство в групах і правила
+    завантажуються фіксованою кількістю запитів для всієї вибірки,
+    після чого кожен розрахунковий лист рахується з пам'яті.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        calculation_date: str,
+        employee_ids: Optional[Iterable[int]] = None,
+        vectorized: Optional[bool] = None,
+        period_start: Optional[date] = None
+    ):
+        self.db = db
+        self.calculation_date = calculation_date
+        self.calc_date = datetime.fromisoformat(calculation_date)
+        # Початок періоду: позиції, що діяли будь-коли з period_start до дати розрахунку
+        self.period_start = period_start
+        self.employee_ids = list(employee_ids) if employee_ids is not None else None
+        self.vectorized = settings.PAYROLL_VECTORIZED if vectorized is None else vectorized
+
+        self.employees: List[Employee] = []
+        self.positions_by_employee: Dict[int, List[Position]] = defaultdict(list)
+        self.contracts_by_position: Dict[int, Contract] = {}
+        self.rule_index: Optional[RuleIndex] = None
+
+    def _employees_query(self):
+        query = select(Employee)
+        if self.employee_ids is None:
+            # Весь персонал - лише активні працівники
+            return query.where(Employee.is_active == True)
+        return query.where(Employee.id.in_(self.employee_ids))
+
+    def load(self) -> "PayrollBatch":
+        """
+        Завантажити всі вхідні дані розрахунку
+        """
+        db = self.db
+        calc_day = self.calc_date.date()
+
+        employees_query = self._employees_query()
+        self.employees = db.execute(employees_query.order_by(Employee.id)).scalars().all()
+
+        # Активні позиції на дату розрахунку (з period_start - за весь період)
+        positions_query = select(Position).where(
+            Position.employee_id.in_(employees_query.with_only_columns(Employee.id)),
+            Position.is_active == True,
+            Position.start_date <= calc_day,
+            (Position.end_date.is_(None) | (Position.end_date >= (self.period_start or calc_day)))
+        )
+        positions = db.execute(positions_query.order_by(Position.id)).scalars().all()
+
+        for position in positions:
+            self.positions_by_employee[position.employee_id].append(position)
+
+        # Активні контракти цих позицій (перший за id - як у запиті з .first())
+        contracts = db.execute(
+            select(Contract).where(
+                Contract.position_id.in_(positions_query.with_only_columns(Position.id)),
+                Contract.is_active == True
+            ).order_by(Contract.id)
+        ).scalars().all()
+
+        for contract in contracts:
+            self.contracts_by_position.setdefault(contract.position_id, contract)
+
+        # Правила і групи - для всіх позицій вибірки
+        self.rule_index = RuleIndex.load(
+            db,
+            datetime.combine(self.period_start, time.min) if self.period_start else self.calc_date,
+            self.calc_date,
+            position_ids=None if self.employee_ids is None else [p.id for p in positions],
+            calculation_date=self.calc_date
+        )
+
+        return self
+
+    def position_moment(self, position: Position) -> datetime:
+        """
+        Момент розрахунку позиції: дата розрахунку або останній день позиції,
+        що закінчилась раніше
+        """
+        if position.end_date is not None and position.end_date < self.calc_date.date():
+            return datetime.combine(position.end_date, time.min)
+        return self.calc_date
+
+    def calculate_positions(self, employees: Sequence[Employee]) -> Dict[int, Union[List[Dict[str, Any]], Exception]]:
+        """
+        Колонковий розрахунок позицій працівників за графом залежностей правил.
+
+        Спочатку для кожної позиції резолвляться правила і будується (з кешу)
+        DAG їх залежностей. Далі граф обходиться по топологічних поколіннях:
+        кожне правило покоління обчислюється один раз над колонкою контекстів
+        усіх позицій, що отримали це правило. Кожен вузол рахується рівно раз -
+        податки одразу від gross_salary, без повторного проходу.
+        """
+        slips: List[PositionSlip] = []
+        for employee in employees:
+            for position in self.positions_by_employee.get(employee.id, ()):
+                contract = self.contracts_by_position.get(position.id)
+                if not contract:
+                    continue
+
+                # Базовий оклад з урахуванням ставки
+                base_salary = contract.base_rate * position.employment_rate
+
+                found = [
+                    item for item in (
+                        self.rule_index.find(position, rule_code, self.calc_date)
+                        for rule_code in RULE_CODES
+                    ) if item
+                ]
+                slips.append(PositionSlip(employee.id, position, base_salary, found))
+
+        evaluate_slips(slips, self.vectorized)
+
+        results: Dict[int, Union[List[Dict[str, Any]], Exception]] = {}
+        for slip in slips:
+            if isinstance(results.get(slip.employee_id), Exception):
+                continue
+            if slip.error is not None:
+                results[slip.employee_id] = slip.error
+                continue
+            results.setdefault(slip.employee_id, []).append(slip.result())
+
+        return results
+
+    def _payslip(self, employee: Employee, positions: Union[List[Dict[str, Any]], Exception, None]) -> Dict[str, Any]:
+        if not self.positions_by_employee.get(employee.id):
+            raise NoActivePositionsError()
+        if isinstance(positions, Exception):
+            raise positions
+
+        return {
+            "employee": employee_info(employee),
+            "calculation_date": self.calculation_date,
+            "positions": positions or []
+        }
+
+    def payslip(self, employee: Employee) -> Dict[str, Any]:
+        """
+        Розрахунковий лист працівника з попередньо завантажених даних
+        """
+        calculated = self.calculate_positions([employee])
+        return self._payslip(employee, calculated.get(employee.id))
+
+    def calculate(self) -> List[Dict[str, Any]]:
+        """
+        Розрахувати всіх працівників вибірки.
+
+        Помилка по одному працівнику не зупиняє розрахунок решти.
+        """
+        calculated = self.calculate_positions(self.employees)
+
+        results = []
+        for employee in self.employees:
+            try:
+                results.append(self._payslip(employee, calculated.get(employee.id)))
+            except NoActivePositionsError as e:
+                results.append({
+                    "employee": employee_info(employee),
+                    "error": f"404: {e}"
+                })
+            except Exception as e:
+                results.append({
+                    "employee": employee_info(employee),
+                    "error": str(e)
+                })
+        return results
+
+
+def iter_payslips(db: Session, calculation_date: str, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Розраховувати активних працівників порціями по chunk_size (keyset за id).
+
+    Кожна порція - окремий PayrollBatch з фіксованою кількістю запитів,
+    тож пам'ять не росте з чисельністю персоналу.
+    """
+    last_id = 0
+    while True:
+        employee_ids = db.execute(
+            select(Employee.id)
+            .where(Employee.is_active == True, Employee.id > last_id)
+            .order_by(Employee.id)
+            .limit(chunk_size)
+        ).scalars().all()
+
+        if not employee_ids:
+            return
+
+        yield from PayrollBatch(db, calculation_date, employee_ids=employee_ids).load().calculate()
+        last_id = employee_ids[-1]
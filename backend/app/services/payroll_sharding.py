@@ -0,0 +1,166 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import ReportingSessionLocal, dispose_engines
+from app.models import Employee, Position
+from app.services.payroll_engine import PayrollBatch
+
+
+SHARD_BY_ID_RANGE = "id_range"
+SHARD_BY_ORG_UNIT = "org_unit"
+SHARD_STRATEGIES = (SHARD_BY_ID_RANGE, SHARD_BY_ORG_UNIT)
+
+
+class ShardPoolBusy(RuntimeError):
+    """Усі слоти шардованих розрахунків зайняті"""
+
+
+def plan_shards(db: Session, shard_count: int, strategy: str = SHARD_BY_ID_RANGE) -> List[List[int]]:
+    """
+    Розбити активних працівників на шарди.
+
+    id_range - суцільні діапазони id однакового розміру;
+    org_unit - цілі підрозділи (за першою позицією працівника),
+    розкладені по шардах від найбільшого до найменшого.
+    """
+    employee_ids = db.execute(
+        select(Employee.id).where(Employee.is_active == True).order_by(Employee.id)
+    ).scalars().all()
+
+    if not employee_ids:
+        return []
+
+    shard_count = max(1, min(shard_count, len(employee_ids)))
+
+    if strategy not in SHARD_STRATEGIES:
+        raise ValueError(f"Unknown shard strategy: {strategy}")
+
+    if strategy == SHARD_BY_ID_RANGE:
+        size = -(-len(employee_ids) // shard_count)
+        return [employee_ids[i:i + size] for i in range(0, len(employee_ids), size)]
+
+    # Підрозділ працівника - за його першою позицією
+    unit_of: Dict[int, Optional[int]] = {}
+    rows = db.execute(
+        select(Position.employee_id, Position.organizational_unit_id)
+        .where(Position.employee_id.in_(
+            select(Employee.id).where(Employee.is_active == True)
+        ))
+        .order_by(Position.id)
+    ).all()
+    for employee_id, unit_id in rows:
+        unit_of.setdefault(employee_id, unit_id)
+
+    units: Dict[Optional[int], List[int]] = {}
+    for employee_id in employee_ids:
+        units.setdefault(unit_of.get(employee_id), []).append(employee_id)
+
+    shards: List[List[int]] = [[] for _ in range(shard_count)]
+    ordered_units = sorted(units.items(), key=lambda item: (-len(item[1]), item[0] is None, item[0] or 0))
+    for _, unit_employees in ordered_units:
+        smallest = min(range(shard_count), key=lambda i: (len(shards[i]), i))
+        shards[smallest].extend(unit_employees)
+
+    return [sorted(shard) for shard in shards if shard]
+
+
+def _init_worker() -> None:
+    # З'єднання батьківського процесу не можна використовувати після fork
+    dispose_engines()
+
+
+def calculate_shard(calculation_date: str, employee_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Розрахувати один шард у власній сесії (виконується у процесі-воркері)
+    """
+    db = ReportingSessionLocal()
+    try:
+        return PayrollBatch(db, calculation_date, employee_ids=employee_ids).load().calculate()
+    finally:
+        db.close()
+
+
+class ShardPool:
+    """
+    Спільний пул процесів для шардованих розрахунків.
+
+    Створюється один раз при старті застосунку (PAYROLL_WORKERS > 1) і
+    закривається при зупинці, тож запити не створюють власних процесів і
+    engine. Одночасно виконується не більше PAYROLL_SHARDED_RUNS розрахунків,
+    решта отримує ShardPoolBusy.
+    """
+
+    def __init__(self, workers: int, max_runs: int):
+        self.workers = workers
+        self._runs = threading.BoundedSemaphore(max(1, max_runs))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is None and self.workers > 1:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def run(self, calculation_date: str, shards: List[List[int]]) -> List[Dict[str, Any]]:
+        """
+        Розрахувати шарди в пулі; результати - у порядку шардів
+        """
+        if self._executor is None:
+            raise RuntimeError("Shard pool is not started")
+        if not self._runs.acquire(blocking=False):
+            raise ShardPoolBusy("Too many sharded calculations in progress")
+        try:
+            results: List[Dict[str, Any]] = []
+            for shard_results in self._executor.map(calculate_shard, [calculation_date] * len(shards), shards):
+                results.extend(shard_results)
+            return results
+        finally:
+            self._runs.release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+shard_pool = ShardPool(settings.PAYROLL_WORKERS, settings.PAYROLL_SHARDED_RUNS)
+
+
+def calculate_sharded(
+    db: Session,
+    calculation_date: str,
+    workers: Optional[int] = None,
+    strategy: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Розрахувати всіх активних працівників у спільному пулі процесів.
+
+    Кількість шардів обмежена розміром пулу; без пулу розрахунок послідовний.
+    Результати зливаються в порядку id працівника - так само,
+    як і в послідовному PayrollBatch, тому відповідь ідентична.
+    """
+    strategy = strategy or settings.PAYROLL_SHARD_STRATEGY
+    if strategy not in SHARD_STRATEGIES:
+        raise ValueError(f"Unknown shard strategy: {strategy}")
+
+    workers = min(workers or settings.PAYROLL_WORKERS, shard_pool.workers)
+    if workers <= 1 or not shard_pool.started:
+        return PayrollBatch(db, calculation_date).load().calculate()
+
+    shards = plan_shards(db, workers, strategy)
+    if len(shards) <= 1:
+        return PayrollBatch(db, calculation_date).load().calculate()
+
+    results = shard_pool.run(calculation_date, shards)
+    results.sort(key=lambda result: result["employee"]["id"])
+    return results
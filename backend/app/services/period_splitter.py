@@ -0,0 +1,354 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Contract, Employee, Position, PositionSchedule, SplitReason
+from app.services.payroll_engine import RULE_CODES, PositionSlip, employee_info, evaluate_slips
+from app.services.rule_finder import IntervalSweep, RuleIndex, as_utc
+
+
+# Причини розбиття (довідник split_reasons)
+CONTRACT_RATE_CHANGE = "CONTRACT_RATE_CHANGE"
+CONTRACT_TYPE_CHANGE = "CONTRACT_TYPE_CHANGE"
+GROUP_ADDED = "GROUP_ADDED"
+GROUP_REMOVED = "GROUP_REMOVED"
+RULE_CHANGED = "RULE_CHANGED"
+SCHEDULE_CHANGE = "SCHEDULE_CHANGE"
+
+AUTO_SPLIT_REASONS = frozenset({
+    CONTRACT_RATE_CHANGE, CONTRACT_TYPE_CHANGE,
+    GROUP_ADDED, GROUP_REMOVED, RULE_CHANGED, SCHEDULE_CHANGE,
+})
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+class Conditions:
+    """Стан вхідних даних позиції, сталий усередині підперіоду"""
+
+    __slots__ = ("contract", "group_ids", "rules", "schedule_id")
+
+    def __init__(
+        self,
+        contract: Optional[Contract],
+        group_ids: FrozenSet[int],
+        rules: List[Dict[str, Any]],
+        schedule_id: Optional[int]
+    ):
+        self.contract = contract
+        self.group_ids = group_ids
+        self.rules = rules
+        self.schedule_id = schedule_id
+
+    @property
+    def rule_ids(self) -> Tuple[int, ...]:
+        return tuple(found["rule"].id for found in self.rules)
+
+    def reasons_since(self, previous: "Conditions") -> List[str]:
+        """
+        Причини, з яких цей стан відрізняється від попереднього
+        """
+        reasons = []
+
+        if previous.contract is not self.contract:
+            if previous.contract is None or self.contract is None:
+                reasons.append(CONTRACT_RATE_CHANGE)
+            elif previous.contract.contract_type != self.contract.contract_type:
+                reasons.append(CONTRACT_TYPE_CHANGE)
+            elif previous.contract.base_rate != self.contract.base_rate:
+                reasons.append(CONTRACT_RATE_CHANGE)
+
+        if self.group_ids - previous.group_ids:
+            reasons.append(GROUP_ADDED)
+        if previous.group_ids - self.group_ids:
+            reasons.append(GROUP_REMOVED)
+
+        if previous.rule_ids != self.rule_ids:
+            reasons.append(RULE_CHANGED)
+
+        if previous.schedule_id != self.schedule_id:
+            reasons.append(SCHEDULE_CHANGE)
+
+        return reasons
+
+
+class SubPeriod:
+    """Підперіод [start, end) позиції зі сталими умовами"""
+
+    __slots__ = ("start", "end", "reasons", "conditions", "fraction")
+
+    def __init__(self, start: datetime, end: datetime, reasons: List[str], conditions: Conditions, fraction: Decimal):
+        self.start = start
+        self.end = end
+        self.reasons = reasons
+        self.conditions = conditions
+        self.fraction = fraction
+
+
+class PeriodSplitter:
+    """
+    Розбиття періоду на підперіоди за змінами умов кожної позиції.
+
+    Контракти, членство в групах, правила і графіки всіх позицій вибірки
+    завантажуються фіксованою кількістю запитів. Для кожної позиції межі
+    змін сортуються один раз, а інтервали контрактів, графіків, груп і правил
+    обходяться одним проходом (IntervalSweep) - O(k log k) на k змін, без
+    звернень до БД по днях. Кінець інтервалу включно, як у RuleIndex.
+    Стан кожного відрізка визначається в його середині; сусідні відрізки
+    без причини розбиття зливаються.
+
+    RATE_CHANGE не визначається: історія employment_rate позиції не зберігається.
+    MIDNIGHT_SPLIT не застосовується: він ділить нічну зміну табеля між
+    календарними днями, а підперіоди тут - частки місячного окладу, на які
+    табелі не впливають. Розбиття змін через опівніч - справа погодинного
+    розрахунку за табелем, якого ще немає.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        start_date: date,
+        end_date: date,
+        employee_ids: Optional[Iterable[int]] = None,
+        rule_codes: Sequence[str] = RULE_CODES
+    ):
+        self.db = db
+        self.start_date = start_date
+        self.end_date = end_date
+        self.period_start = day_start(start_date)
+        # Кінець періоду - включно з останнім днем
+        self.period_end = day_start(end_date + timedelta(days=1))
+        self.employee_ids = list(employee_ids) if employee_ids is not None else None
+        self.rule_codes = list(rule_codes)
+
+        self.employees: List[Employee] = []
+        self.positions_by_employee: Dict[int, List[Position]] = defaultdict(list)
+        self.contracts_by_position: Dict[int, List[Contract]] = defaultdict(list)
+        self.schedules_by_position: Dict[int, List[PositionSchedule]] = defaultdict(list)
+        self.rule_index: Optional[RuleIndex] = None
+        self.split_reasons: FrozenSet[str] = AUTO_SPLIT_REASONS
+
+    def load(self) -> "PeriodSplitter":
+        """
+        Завантажити всі зміни умов у межах періоду
+        """
+        db = self.db
+
+        employees_query = select(Employee)
+        if self.employee_ids is None:
+            employees_query = employees_query.where(Employee.is_active == True)
+        else:
+            employees_query = employees_query.where(Employee.id.in_(self.employee_ids))
+        self.employees = db.execute(employees_query.order_by(Employee.id)).scalars().all()
+
+        # Позиції, що діяли хоча б частину періоду
+        positions_query = select(Position).where(
+            Position.employee_id.in_(employees_query.with_only_columns(Employee.id)),
+            Position.is_active == True,
+            Position.start_date <= self.end_date,
+            (Position.end_date.is_(None) | (Position.end_date >= self.start_date))
+        )
+        positions = db.execute(positions_query.order_by(Position.id)).scalars().all()
+        for position in positions:
+            self.positions_by_employee[position.employee_id].append(position)
+
+        position_ids = positions_query.with_only_columns(Position.id)
+
+        contracts = db.execute(
+            select(Contract).where(
+                Contract.position_id.in_(position_ids),
+                Contract.is_active == True,
+                Contract.start_datetime < self.period_end,
+                (Contract.end_datetime.is_(None) | (Contract.end_datetime >= self.period_start))
+            ).order_by(Contract.id)
+        ).scalars().all()
+        for contract in contracts:
+            self.contracts_by_position[contract.position_id].append(contract)
+
+        schedules = db.execute(
+            select(PositionSchedule).where(
+                PositionSchedule.position_id.in_(position_ids),
+                PositionSchedule.is_active == True,
+                PositionSchedule.valid_from < self.period_end,
+                (PositionSchedule.valid_until.is_(None) | (PositionSchedule.valid_until >= self.period_start))
+            ).order_by(PositionSchedule.id)
+        ).scalars().all()
+        for schedule in schedules:
+            self.schedules_by_position[schedule.position_id].append(schedule)
+
+        self.rule_index = RuleIndex.load(
+            db,
+            self.period_start,
+            self.period_end,
+            position_ids=None if self.employee_ids is None else [p.id for p in positions]
+        )
+
+        # Причини з auto_split = false (ручні) не розбивають період автоматично
+        configured = db.execute(select(SplitReason.code, SplitReason.auto_split)).all()
+        if configured:
+            self.split_reasons = frozenset(code for code, auto_split in configured if auto_split)
+
+        return self
+
+    def position_window(self, position: Position) -> Tuple[datetime, datetime]:
+        """
+        Частина періоду, в яку позиція діяла
+        """
+        start = max(self.period_start, day_start(position.start_date))
+        end = self.period_end
+        if position.end_date is not None:
+            end = min(end, day_start(position.end_date + timedelta(days=1)))
+        return start, end
+
+    def iter_conditions(self, position: Position, moments: Iterable[datetime]) -> Iterable[Conditions]:
+        """
+        Умови позиції на кожен з неспадних моментів одним проходом
+        """
+        contracts = IntervalSweep(
+            (c.start_datetime, c.end_datetime, c) for c in self.contracts_by_position.get(position.id, ())
+        )
+        schedules = IntervalSweep(
+            (s.valid_from, s.valid_until, s.schedule_id) for s in self.schedules_by_position.get(position.id, ())
+        )
+        rules = self.rule_index.sweep(position, self.rule_codes)
+
+        for moment in moments:
+            group_ids, found = rules.at(moment)
+            yield Conditions(contracts.first(moment), frozenset(group_ids), found, schedules.first(moment))
+
+    def change_moments(self, position: Position) -> List[datetime]:
+        """
+        Усі моменти, в які могли змінитись умови позиції
+        """
+        memberships = self.rule_index.memberships(position.id)
+
+        moments = []
+        for contract in self.contracts_by_position.get(position.id, ()):
+            moments.append(as_utc(contract.start_datetime))
+            if contract.end_datetime is not None:
+                moments.append(as_utc(contract.end_datetime))
+        for valid_from, valid_until, _ in memberships:
+            moments.append(valid_from)
+            if valid_until is not None:
+                moments.append(valid_until)
+        for schedule in self.schedules_by_position.get(position.id, ()):
+            moments.append(as_utc(schedule.valid_from))
+            if schedule.valid_until is not None:
+                moments.append(as_utc(schedule.valid_until))
+        moments.extend(self.rule_index.change_moments(position, {group_id for _, _, group_id in memberships}))
+        return moments
+
+    def split(self, position: Position) -> List[SubPeriod]:
+        """
+        Підперіоди позиції зі сталими умовами і часткою від тривалості періоду
+        """
+        window_start, window_end = self.position_window(position)
+        if window_start >= window_end:
+            return []
+
+        boundaries = sorted({
+            moment for moment in self.change_moments(position)
+            if window_start < moment < window_end
+        })
+        edges = [window_start] + boundaries + [window_end]
+
+        segments = list(zip(edges, edges[1:]))
+        midpoints = (start + (end - start) / 2 for start, end in segments)
+
+        sub_periods: List[SubPeriod] = []
+        for (start, end), conditions in zip(segments, self.iter_conditions(position, midpoints)):
+            if sub_periods:
+                previous = sub_periods[-1]
+                reasons = [
+                    reason for reason in conditions.reasons_since(previous.conditions)
+                    if reason in self.split_reasons
+                ]
+                if not reasons:
+                    previous.end = end
+                    continue
+            else:
+                reasons = []
+
+            sub_periods.append(SubPeriod(start, end, reasons, conditions, Decimal(0)))
+
+        period_seconds = Decimal((self.period_end - self.period_start).total_seconds())
+        for sub_period in sub_periods:
+            sub_period.fraction = Decimal((sub_period.end - sub_period.start).total_seconds()) / period_seconds
+
+        return sub_periods
+
+    def calculate(self, vectorized: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Розрахунок кожного працівника по підперіодах.
+
+        Правила підперіоду обчислюються від місячного окладу за його умов,
+        після чого всі суми пропорційно зменшуються на частку підперіоду.
+        """
+        vectorized = settings.PAYROLL_VECTORIZED if vectorized is None else vectorized
+
+        parts: List[Tuple[PositionSlip, SubPeriod]] = []
+        for employee in self.employees:
+            for position in self.positions_by_employee.get(employee.id, ()):
+                for sub_period in self.split(position):
+                    contract = sub_period.conditions.contract
+                    if contract is None:
+                        continue
+                    base_salary = contract.base_rate * position.employment_rate
+                    slip = PositionSlip(employee.id, position, base_salary, sub_period.conditions.rules)
+                    parts.append((slip, sub_period))
+
+        evaluate_slips([slip for slip, _ in parts], vectorized)
+
+        by_position: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        errors: Dict[int, Exception] = {}
+        for slip, sub_period in parts:
+            if slip.error is not None:
+                errors.setdefault(slip.employee_id, slip.error)
+                continue
+            slip.prorate(sub_period.fraction)
+            result = slip.result()
+            result.pop("position")
+            by_position[slip.position.id].append({
+                "start": sub_period.start.isoformat(),
+                "end": sub_period.end.isoformat(),
+                "split_reasons": sub_period.reasons,
+                "fraction": float(sub_period.fraction),
+                "contract_id": sub_period.conditions.contract.id,
+                **result
+            })
+
+        results = []
+        for employee in self.employees:
+            if employee.id in errors:
+                results.append({"employee": employee_info(employee), "error": str(errors[employee.id])})
+                continue
+
+            positions = []
+            for position in self.positions_by_employee.get(employee.id, ()):
+                sub_periods = by_position.get(position.id, [])
+                positions.append({
+                    "position": {
+                        "id": position.id,
+                        "code": position.position_code,
+                        "name": position.position_name,
+                        "employment_rate": float(position.employment_rate)
+                    },
+                    "sub_periods": sub_periods,
+                    "gross_salary": sum(part["gross_salary"] for part in sub_periods),
+                    "net_salary": sum(part["net_salary"] for part in sub_periods)
+                })
+
+            results.append({
+                "employee": employee_info(employee),
+                "period": {"start_date": self.start_date.isoformat(), "end_date": self.end_date.isoformat()},
+                "positions": positions
+            })
+
+        return results
@@ -0,0 +1,387 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Any, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import CalculationRule, PositionGroup, Group, OrganizationalUnit
+from app.services.group_hierarchy import ancestor_ids
+
+
+LEVEL_POSITION = "POSITION"
+LEVEL_GROUP = "GROUP"
+LEVEL_ORG_UNIT = "ORG_UNIT"
+LEVEL_GLOBAL = "GLOBAL"
+
+
+def as_utc(moment: datetime) -> datetime:
+    """
+    Привести дату до timezone-aware (naive вважаємо UTC, як і PostgreSQL)
+    """
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def is_valid_at(valid_from: datetime, valid_until: Optional[datetime], moment: datetime) -> bool:
+    """
+    Перевірити чи інтервал [valid_from, valid_until] містить момент
+    """
+    return as_utc(valid_from) <= moment and (valid_until is None or as_utc(valid_until) >= moment)
+
+
+Interval = Tuple[datetime, Optional[datetime], Any]
+
+
+class IntervalSweep:
+    """
+    Інтервали [valid_from, valid_until] (межі включно, як у is_valid_at),
+    відсортовані один раз, для запитів з неспадними моментами.
+
+    Кожен інтервал додається і видаляється з активних один раз - O(n log n)
+    на весь прохід замість перебору всіх інтервалів на кожен момент.
+    Пріоритет елемента - його позиція у вхідному списку (first повертає
+    те саме, що й перший валідний елемент при лінійному пошуку).
+    """
+
+    def __init__(self, intervals: Iterable[Interval]):
+        normalized = [
+            (as_utc(valid_from), as_utc(valid_until) if valid_until is not None else None, value)
+            for valid_from, valid_until, value in intervals
+        ]
+        self._pending = sorted(enumerate(normalized), key=lambda item: item[1][0])
+        self._next = 0
+        self._active: Dict[int, Any] = {}
+        self._by_priority: List[int] = []
+        self._by_until: List[Tuple[datetime, int]] = []
+        self._moment: Optional[datetime] = None
+
+    def _advance(self, moment: datetime) -> None:
+        if self._moment is not None and moment < self._moment:
+            raise ValueError("IntervalSweep moments must not decrease")
+        self._moment = moment
+
+        while self._next < len(self._pending) and self._pending[self._next][1][0] <= moment:
+            seq, (_, valid_until, value) = self._pending[self._next]
+            self._next += 1
+            if valid_until is not None and valid_until < moment:
+                continue
+            self._active[seq] = value
+            heapq.heappush(self._by_priority, seq)
+            if valid_until is not None:
+                heapq.heappush(self._by_until, (valid_until, seq))
+
+        while self._by_until and self._by_until[0][0] < moment:
+            _, seq = heapq.heappop(self._by_until)
+            self._active.pop(seq, None)
+
+    def first(self, moment: datetime) -> Optional[Any]:
+        """
+        Перший за порядком вхідного списку елемент, дійсний на момент
+        """
+        self._advance(moment)
+        while self._by_priority and self._by_priority[0] not in self._active:
+            heapq.heappop(self._by_priority)
+        return self._active[self._by_priority[0]] if self._by_priority else None
+
+    def all(self, moment: datetime) -> List[Any]:
+        """
+        Усі елементи, дійсні на момент, у порядку вхідного списку
+        """
+        self._advance(moment)
+        return [self._active[seq] for seq in sorted(self._active)]
+
+
+class RuleIndex:
+    """
+    Індекс правил розрахунку в пам'яті.
+
+    Завантажує активні CalculationRule і PositionGroup для дати (або вікна дат)
+    за фіксовану кількість запитів і резолвить 4-рівневу ієрархію
+    POSITION → GROUP → ORG_UNIT → GLOBAL без звернень до БД.
+    """
+
+    def __init__(self, calculation_date: datetime):
+        self.calculation_date = as_utc(calculation_date)
+        # (scope, scope_id, code) -> [(valid_from, valid_until, rule)]
+        self._rules: Dict[Tuple[str, Optional[int], str], List[Tuple[datetime, Optional[datetime], CalculationRule]]] = defaultdict(list)
+        # position_id -> [(valid_from, valid_until, group_id)]
+        self._memberships: Dict[int, List[Tuple[datetime, Optional[datetime], int]]] = defaultdict(list)
+        # group_id -> предки групи (ближчі - першими), для успадкування правил
+        self._group_ancestors: Dict[int, List[int]] = {}
+        # (scope, scope_id) -> межі дії правил цього scope
+        self._scope_moments: Dict[Tuple[str, Optional[int]], List[datetime]] = defaultdict(list)
+        self._group_names: Dict[int, str] = {}
+        self._org_unit_names: Dict[int, str] = {}
+
+    @classmethod
+    def load(
+        cls,
+        db: Session,
+        valid_from: datetime,
+        valid_until: Optional[datetime] = None,
+        position_ids: Optional[Iterable[int]] = None,
+        calculation_date: Optional[datetime] = None
+    ) -> "RuleIndex":
+        """
+        Завантажити правила і членство в групах, що діють у вікні [valid_from, valid_until].
+
+        position_ids обмежує персональні правила і членство в групах
+        вказаними позиціями (None - всі позиції). calculation_date - момент
+        пошуку за замовчуванням (None - початок вікна).
+        """
+        window_start = as_utc(valid_from)
+        window_end = as_utc(valid_until) if valid_until else window_start
+        index = cls(as_utc(calculation_date) if calculation_date else window_start)
+
+        if position_ids is not None:
+            position_ids = list(position_ids)
+
+        # Правила разом з назвами груп і підрозділів (для поля source)
+        rules_query = db.query(
+            CalculationRule, Group.name, OrganizationalUnit.name
+        ).outerjoin(
+            Group, Group.id == CalculationRule.group_id
+        ).outerjoin(
+            OrganizationalUnit, OrganizationalUnit.id == CalculationRule.organizational_unit_id
+        ).filter(
+            CalculationRule.is_active == True,
+            CalculationRule.valid_from <= window_end,
+            (CalculationRule.valid_until.is_(None) | (CalculationRule.valid_until >= window_start))
+        )
+
+        if position_ids is not None:
+            rules_query = rules_query.filter(or_(
+                CalculationRule.position_id.is_(None),
+                CalculationRule.position_id.in_(position_ids)
+            ))
+
+        for rule, group_name, org_unit_name in rules_query.all():
+            index.add_rule(rule)
+            if rule.group_id is not None:
+                index._group_names[rule.group_id] = group_name
+            if rule.organizational_unit_id is not None:
+                index._org_unit_names[rule.organizational_unit_id] = org_unit_name
+
+        # Членство позицій в групах
+        memberships_query = db.query(
+            PositionGroup.position_id,
+            PositionGroup.group_id,
+            PositionGroup.valid_from,
+            PositionGroup.valid_until
+        ).filter(
+            PositionGroup.is_active == True,
+            PositionGroup.valid_from <= window_end,
+            (PositionGroup.valid_until.is_(None) | (PositionGroup.valid_until >= window_start))
+        ).order_by(PositionGroup.id)
+
+        if position_ids is not None:
+            memberships_query = memberships_query.filter(PositionGroup.position_id.in_(position_ids))
+
+        for position_id, group_id, pg_from, pg_until in memberships_query.all():
+            index._memberships[position_id].append((as_utc(pg_from), pg_until and as_utc(pg_until), group_id))
+
+        # Батьківські групи - з closure table одним запитом
+        if settings.GROUP_RULE_INHERITANCE:
+            index._group_ancestors = ancestor_ids(db, {
+                group_id for memberships in index._memberships.values() for _, _, group_id in memberships
+            })
+
+        index._sort()
+        return index
+
+    def add_rule(self, rule: CalculationRule) -> None:
+        """
+        Додати правило в індекс за всіма його scope
+        """
+        interval = (as_utc(rule.valid_from), rule.valid_until and as_utc(rule.valid_until), rule)
+
+        scopes = []
+        if rule.position_id is not None:
+            scopes.append((LEVEL_POSITION, rule.position_id))
+        if rule.group_id is not None:
+            scopes.append((LEVEL_GROUP, rule.group_id))
+        if rule.organizational_unit_id is not None:
+            scopes.append((LEVEL_ORG_UNIT, rule.organizational_unit_id))
+        if not scopes:
+            scopes.append((LEVEL_GLOBAL, None))
+
+        for scope, scope_id in scopes:
+            self._rules[(scope, scope_id, rule.code)].append(interval)
+            self._scope_moments[(scope, scope_id)].append(interval[0])
+            if interval[1] is not None:
+                self._scope_moments[(scope, scope_id)].append(interval[1])
+
+    def _sort(self) -> None:
+        # Найновіша версія правила - першою
+        for intervals in self._rules.values():
+            intervals.sort(key=lambda item: (item[0], item[2].id), reverse=True)
+
+    def _pick(self, key: Tuple[str, Optional[int], str], moment: datetime) -> Optional[CalculationRule]:
+        for valid_from, valid_until, rule in self._rules.get(key, ()):
+            if is_valid_at(valid_from, valid_until, moment):
+                return rule
+        return None
+
+    def group_ids_for(self, position_id: int, at: Optional[datetime] = None) -> List[int]:
+        """
+        Групи, в яких позиція перебуває на момент at
+        """
+        moment = as_utc(at) if at else self.calculation_date
+        return [
+            group_id
+            for valid_from, valid_until, group_id in self._memberships.get(position_id, ())
+            if is_valid_at(valid_from, valid_until, moment)
+        ]
+
+    def rule_group_ids(self, position_id: int, at: Optional[datetime] = None) -> List[int]:
+        """
+        Групи, правила яких діють на позицію: власні групи, далі їхні предки
+        """
+        return self._with_ancestors(self.group_ids_for(position_id, at))
+
+    def _with_ancestors(self, group_ids: List[int]) -> List[int]:
+        if not self._group_ancestors:
+            return group_ids
+
+        result = list(group_ids)
+        seen = set(group_ids)
+        for group_id in group_ids:
+            for ancestor_id in self._group_ancestors.get(group_id, ()):
+                if ancestor_id not in seen:
+                    seen.add(ancestor_id)
+                    result.append(ancestor_id)
+        return result
+
+    def memberships(self, position_id: int) -> List[Tuple[datetime, Optional[datetime], int]]:
+        """
+        Інтервали членства позиції в групах: [(valid_from, valid_until, group_id)]
+        """
+        return self._memberships.get(position_id, [])
+
+    def change_moments(self, position, group_ids: Iterable[int]) -> List[datetime]:
+        """
+        Межі дії правил (valid_from / valid_until), що можуть застосовуватись до позиції:
+        персональних, груп group_ids, підрозділу позиції і глобальних
+        """
+        scopes = {(LEVEL_POSITION, position.id), (LEVEL_ORG_UNIT, position.organizational_unit_id), (LEVEL_GLOBAL, None)}
+        for group_id in group_ids:
+            scopes.add((LEVEL_GROUP, group_id))
+            scopes.update((LEVEL_GROUP, ancestor_id) for ancestor_id in self._group_ancestors.get(group_id, ()))
+
+        moments = []
+        for scope in scopes:
+            moments.extend(self._scope_moments.get(scope, ()))
+        return moments
+
+    def find(self, position, rule_code: str, at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Знайти правило за 4-рівневою ієрархією:
+        1. POSITION (персональне)
+        2. GROUP (групи працівника і їхні батьківські групи)
+        3. ORG_UNIT (підрозділ)
+        4. GLOBAL (загальне)
+        """
+        moment = as_utc(at) if at else self.calculation_date
+        return self._resolve(
+            position, rule_code, self.rule_group_ids(position.id, moment),
+            lambda key: self._pick(key, moment)
+        )
+
+    def _resolve(
+        self,
+        position,
+        rule_code: str,
+        group_ids: List[int],
+        pick: Callable[[Tuple[str, Optional[int], str]], Optional[CalculationRule]]
+    ) -> Optional[Dict[str, Any]]:
+        # Рівень 1: POSITION
+        rule = pick((LEVEL_POSITION, position.id, rule_code))
+        if rule:
+            return {
+                "rule": rule,
+                "level": LEVEL_POSITION,
+                "source": f"Position {position.position_code}"
+            }
+
+        # Рівень 2: GROUP (власні групи, потім батьківські)
+        for group_id in group_ids:
+            rule = pick((LEVEL_GROUP, group_id, rule_code))
+            if rule:
+                return {
+                    "rule": rule,
+                    "level": LEVEL_GROUP,
+                    "source": f"Group {self._group_names.get(group_id)}"
+                }
+
+        # Рівень 3: ORG_UNIT
+        rule = pick((LEVEL_ORG_UNIT, position.organizational_unit_id, rule_code))
+        if rule:
+            return {
+                "rule": rule,
+                "level": LEVEL_ORG_UNIT,
+                "source": f"Org Unit {self._org_unit_names.get(position.organizational_unit_id)}"
+            }
+
+        # Рівень 4: GLOBAL
+        rule = pick((LEVEL_GLOBAL, None, rule_code))
+        if rule:
+            return {
+                "rule": rule,
+                "level": LEVEL_GLOBAL,
+                "source": "Global rule"
+            }
+
+        return None
+
+    def sweep(self, position, rule_codes: Iterable[str]) -> "RuleSweep":
+        """
+        Правила і групи позиції для послідовних (неспадних) моментів
+        """
+        return RuleSweep(self, position, rule_codes)
+
+
+class RuleSweep:
+    """
+    Резолв правил позиції за зростаючими моментами одним проходом.
+
+    Для кожного ключа (scope, scope_id, code), що може стосуватись позиції,
+    інтервали правил обходяться IntervalSweep; результат на кожен момент
+    той самий, що й у RuleIndex.find / group_ids_for.
+    """
+
+    def __init__(self, index: RuleIndex, position, rule_codes: Iterable[str]):
+        self.index = index
+        self.position = position
+        self.rule_codes = list(rule_codes)
+        memberships = index.memberships(position.id)
+        self._memberships = IntervalSweep(memberships)
+
+        group_ids = index._with_ancestors(list(dict.fromkeys(group_id for _, _, group_id in memberships)))
+        self._rules: Dict[Tuple[str, Optional[int], str], IntervalSweep] = {}
+        for rule_code in self.rule_codes:
+            keys = [(LEVEL_POSITION, position.id, rule_code)]
+            keys.extend((LEVEL_GROUP, group_id, rule_code) for group_id in group_ids)
+            keys.append((LEVEL_ORG_UNIT, position.organizational_unit_id, rule_code))
+            keys.append((LEVEL_GLOBAL, None, rule_code))
+            for key in keys:
+                if key in index._rules:
+                    self._rules[key] = IntervalSweep(index._rules[key])
+
+    def at(self, moment: datetime) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """
+        Групи позиції і знайдені правила (у порядку rule_codes) на момент
+        """
+        moment = as_utc(moment)
+        group_ids = self._memberships.all(moment)
+
+        def pick(key):
+            sweep = self._rules.get(key)
+            return sweep.first(moment) if sweep is not None else None
+
+        rule_group_ids = self.index._with_ancestors(group_ids)
+        found = [self.index._resolve(self.position, rule_code, rule_group_ids, pick) for rule_code in self.rule_codes]
+        return group_ids, [item for item in found if item]
@@ -0,0 +1,112 @@
+from graphlib import CycleError, TopologicalSorter
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from app.models import CalculationRule
+from app.services.formula import FormulaError, formula_cache
+
+
+BASE_SALARY = "base_salary"
+# Синтетичний вузол: base_salary + усі нарахування (accrual/benefit)
+GROSS_SALARY = "gross_salary"
+
+ACCRUAL_TYPES = ("accrual", "benefit")
+
+# Кількість різних наборів правил, для яких тримаються готові графи
+_GRAPH_CACHE_LIMIT = 1024
+
+
+def node_name(rule_code: str) -> str:
+    """Вузол графа і змінна формул для результату правила"""
+    return rule_code.lower()
+
+
+class RuleGraph:
+    """
+    DAG залежностей між правилами позиції.
+
+    Вузли - правила (за кодом у нижньому регістрі) і синтетичний gross_salary;
+    ребра - змінні, на які посилаються формули. generations - топологічні
+    покоління: вузли одного покоління не залежать один від одного, тож кожне
+    правило покоління можна обчислити окремим векторним пакетом.
+
+    Граф не тримає самих правил (вони прив'язані до сесії), лише структуру,
+    тому кешується між розрахунками за набором (id, version) правил.
+    """
+
+    def __init__(
+        self,
+        generations: List[Tuple[str, ...]],
+        dependencies: Dict[str, FrozenSet[str]],
+        bindings: Dict[str, Dict[str, str]],
+        accruals: Tuple[str, ...]
+    ):
+        self.generations = generations
+        self.dependencies = dependencies
+        # Змінна формули -> вузол, з якого береться значення
+        self.bindings = bindings
+        self.accruals = accruals
+
+
+def _formula_variables(rule: CalculationRule) -> FrozenSet[str]:
+    try:
+        return formula_cache.get(rule).variables
+    except FormulaError:
+        # Помилка формули з'явиться під час обчислення цього правила
+        return frozenset()
+
+
+def build_rule_graph(rules: Sequence[CalculationRule], taxes_on_gross: bool = False) -> RuleGraph:
+    """
+    Побудувати DAG для набору правил позиції.
+
+    taxes_on_gross - у податкових формулах base_salary означає gross_salary
+    (семантика /payroll/calculate). Цикл залежностей - ValueError.
+    """
+    nodes = {node_name(rule.code): rule for rule in rules}
+    accruals = tuple(name for name, rule in nodes.items() if rule.rule_type in ACCRUAL_TYPES)
+
+    dependencies: Dict[str, FrozenSet[str]] = {GROSS_SALARY: frozenset(accruals)}
+    bindings: Dict[str, Dict[str, str]] = {}
+    for name, rule in nodes.items():
+        binding = {variable: variable for variable in _formula_variables(rule)}
+        if taxes_on_gross and rule.rule_type == 'tax' and BASE_SALARY in binding:
+            binding[BASE_SALARY] = GROSS_SALARY
+
+        bindings[name] = binding
+        dependencies[name] = frozenset(
+            source for source in binding.values()
+            if source in nodes or source == GROSS_SALARY
+        )
+
+    sorter = TopologicalSorter(dependencies)
+    try:
+        sorter.prepare()
+    except CycleError as e:
+        raise ValueError(f"Circular rule dependency: {' -> '.join(e.args[1])}")
+
+    generations = []
+    while sorter.is_active():
+        ready = tuple(sorted(sorter.get_ready()))
+        generations.append(ready)
+        sorter.done(*ready)
+
+    return RuleGraph(generations, dependencies, bindings, accruals)
+
+
+_graphs: Dict[Tuple, RuleGraph] = {}
+
+
+def rule_graph(rules: Sequence[CalculationRule], taxes_on_gross: bool = False) -> RuleGraph:
+    """
+    Граф для набору правил (з кешу)
+    """
+    key = (taxes_on_gross,) + tuple(
+        (rule.id, rule.version, rule.code, rule.rule_type, rule.sql_code) for rule in rules
+    )
+    graph = _graphs.get(key)
+    if graph is None:
+        graph = build_rule_graph(rules, taxes_on_gross)
+        if len(_graphs) >= _GRAPH_CACHE_LIMIT:
+            _graphs.clear()
+        _graphs[key] = graph
+    return graph
@@ -0,0 +1,164 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.models import CalculationRule, CalculationTemplate, Position, TemplateRule
+from app.services.formula import CompiledFormula, FormulaError, formula_cache, to_money
+from app.services.rule_finder import RuleIndex, LEVEL_POSITION, LEVEL_GROUP, LEVEL_ORG_UNIT
+from app.services.rule_graph import ACCRUAL_TYPES, node_name
+
+
+DEDUCTION_TYPES = ("deduction", "tax")
+
+
+def rule_source(rule: CalculationRule, level: Optional[str] = None) -> Tuple[str, Optional[int]]:
+    """
+    Джерело правила для аудиту (rule_source_type, rule_source_id)
+    """
+    if level == LEVEL_POSITION or (level is None and rule.position_id is not None):
+        return "position", rule.position_id
+    if level == LEVEL_GROUP or (level is None and rule.group_id is not None):
+        return "group", rule.group_id
+    if level == LEVEL_ORG_UNIT or (level is None and rule.organizational_unit_id is not None):
+        return "organizational_unit", rule.organizational_unit_id
+    return "global", None
+
+
+def rule_formula(rule: CalculationRule) -> CompiledFormula:
+    """
+    Скомпільована формула правила (з кешу); помилка формули - FormulaError з кодом правила
+    """
+    try:
+        return formula_cache.get(rule)
+    except FormulaError as e:
+        raise FormulaError(f"Invalid formula of rule {rule.code} (id={rule.id}): {e}")
+
+
+class TemplateStep:
+    """Крок плану: код правила шаблону і правило за замовчуванням"""
+
+    __slots__ = ("order", "code", "variable", "default_rule")
+
+    def __init__(self, order: int, rule: CalculationRule):
+        self.order = order
+        self.code = rule.code
+        self.variable = node_name(rule.code)
+        self.default_rule = rule
+
+
+class StepResult:
+    """Результат кроку для однієї позиції"""
+
+    __slots__ = ("step", "rule", "level", "amount", "calculation_base")
+
+    def __init__(self, step: TemplateStep, rule: CalculationRule, level: Optional[str],
+                 amount: Decimal, calculation_base: Decimal):
+        self.step = step
+        self.rule = rule
+        self.level = level
+        self.amount = amount
+        self.calculation_base = calculation_base
+
+    @property
+    def signed_amount(self) -> Decimal:
+        # Утримання і податки зберігаються з від'ємним знаком
+        if self.rule.rule_type in DEDUCTION_TYPES:
+            return -self.amount
+        return self.amount
+
+
+class TemplatePlan:
+    """
+    План виконання шаблону: кроки в порядку TemplateRule.execution_order.
+
+    Будується один раз на шаблон. Кожне правило шаблону резолвиться для позиції
+    за ієрархією POSITION → GROUP → ORG_UNIT → GLOBAL (через RuleIndex у пам'яті),
+    а якщо перевизначення немає - використовується правило самого шаблону.
+
+    Контекст формули позиції:
+    - base_rate, employment_rate, base_salary - з контракту і позиції;
+    - gross_salary - сума нарахувань (accrual/benefit) на поточному кроці;
+    - <код правила в нижньому регістрі> - результати попередніх кроків.
+    """
+
+    def __init__(self, template: CalculationTemplate, steps: List[TemplateStep]):
+        self.template = template
+        self.steps = steps
+        # Якщо шаблон сам нараховує BASE_SALARY, оклад входить у gross через цей крок
+        self.base_in_gross = not any(step.code == "BASE_SALARY" for step in steps)
+
+    @classmethod
+    def compile(cls, db: Session, template: CalculationTemplate) -> "TemplatePlan":
+        template_rules = db.query(TemplateRule).options(
+            joinedload(TemplateRule.rule)
+        ).filter(
+            TemplateRule.template_id == template.id,
+            TemplateRule.is_active == True
+        ).order_by(TemplateRule.execution_order, TemplateRule.id).all()
+
+        steps = [TemplateStep(tr.execution_order, tr.rule) for tr in template_rules]
+
+        # Перевірити формули заздалегідь, а не посеред розрахунку
+        for step in steps:
+            rule_formula(step.default_rule)
+
+        return cls(template, steps)
+
+    def resolve(
+        self,
+        position: Position,
+        rule_index: RuleIndex,
+        at: Optional[datetime] = None
+    ) -> List[Tuple[TemplateStep, CalculationRule, Optional[str]]]:
+        """
+        Правило для кожного кроку з урахуванням ієрархії (на момент at, None - дата індексу)
+        """
+        resolved = []
+        for step in self.steps:
+            found = rule_index.find(position, step.code, at)
+            if found:
+                resolved.append((step, found["rule"], found["level"]))
+            else:
+                resolved.append((step, step.default_rule, None))
+        return resolved
+
+    def execute(
+        self,
+        position: Position,
+        base_rate: Decimal,
+        rule_index: Optional[RuleIndex] = None,
+        resolved: Optional[List[Tuple[TemplateStep, CalculationRule, Optional[str]]]] = None
+    ) -> List[StepResult]:
+        """
+        Виконати кроки шаблону для позиції (правила - вже резолвлені або через rule_index)
+        """
+        if resolved is None:
+            resolved = self.resolve(position, rule_index)
+
+        base_salary = base_rate * position.employment_rate
+        context: Dict[str, Any] = {
+            "base_rate": float(base_rate),
+            "employment_rate": float(position.employment_rate),
+            "base_salary": float(base_salary),
+        }
+        gross_salary = base_salary if self.base_in_gross else Decimal(0)
+        context["gross_salary"] = float(gross_salary)
+
+        results = []
+        for step, rule, level in resolved:
+            try:
+                value = rule_formula(rule).evaluate(**context)
+            except Exception as e:
+                raise ValueError(f"Error calculating rule {rule.code} for position {position.position_code}: {e}")
+
+            amount = to_money(value)
+            results.append(StepResult(step, rule, level, amount, to_money(base_salary)))
+
+            context[step.variable] = float(amount)
+            if rule.rule_type in ACCRUAL_TYPES:
+                gross_salary += amount
+                context["gross_salary"] = float(gross_salary)
+
+        return results
@@ -0,0 +1,4 @@
+"""
+Бенчмарки розрахунку зарплати: генератор синтетичних даних і сценарії
+для гарячих ендпоінтів з p50/p95 і кількістю SQL-запитів.
+"""
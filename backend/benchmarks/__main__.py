@@ -0,0 +1,151 @@
+"""
+CLI бенчмарків (запускати з каталогу backend):
+
+    python -m benchmarks generate --employees 5000 --org-units 50 --groups 80
+    python -m benchmarks run --base-url http://localhost:8000 --save baseline.json
+    python -m benchmarks run --compare baseline.json
+    python -m benchmarks compare current.json baseline.json
+"""
+import argparse
+import json
+import sys
+
+from app.core.database import SessionLocal
+from benchmarks.baseline import compare_reports, load_report, make_report, save_report
+from benchmarks.datagen import DatasetParams, dataset_exists, generate_dataset, reset_dataset
+from benchmarks.runner import ApiClient, run_scenario
+from benchmarks.scenarios import SCENARIOS, load_context, scenario_by_name
+
+
+def cmd_generate(args) -> int:
+    params = DatasetParams(
+        org_units=args.org_units,
+        employees=args.employees,
+        multi_position_share=args.multi_position_share,
+        groups=args.groups,
+        group_depth=args.group_depth,
+        memberships_per_position=args.memberships,
+        position_rule_share=args.position_rule_share,
+        timesheets=not args.no_timesheets,
+        run_periods=args.run_periods,
+        seed=args.seed
+    )
+    db = SessionLocal()
+    try:
+        if dataset_exists(db):
+            if not args.reset:
+                print("Benchmark dataset already exists, use --reset to regenerate")
+                return 1
+            reset_dataset(db)
+        counts = generate_dataset(db, params)
+    finally:
+        db.close()
+
+    print(json.dumps({"params": params.to_dict(), "created": counts}, indent=2))
+    return 0
+
+
+def cmd_reset(args) -> int:
+    db = SessionLocal()
+    try:
+        reset_dataset(db)
+    finally:
+        db.close()
+    print("Benchmark dataset removed")
+    return 0
+
+
+def _print_compare(current, baseline, threshold) -> int:
+    lines, regressions = compare_reports(current, baseline, threshold)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+def cmd_run(args) -> int:
+    db = SessionLocal()
+    try:
+        context = load_context(db, args.sample)
+    finally:
+        db.close()
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        by_name = scenario_by_name()
+        unknown = [name for name in args.scenario if name not in by_name]
+        if unknown:
+            print(f"Unknown scenarios: {', '.join(unknown)}. Available: {', '.join(by_name)}")
+            return 2
+        scenarios = [by_name[name] for name in args.scenario]
+
+    client = ApiClient(args.base_url)
+    results = {}
+    for scenario in scenarios:
+        result = run_scenario(client, scenario, context, args.iterations, args.concurrency)
+        results[scenario.name] = result
+        print(f"{scenario.name:<26}{json.dumps(result)}", flush=True)
+
+    report = make_report(args.base_url, context, results)
+    if args.save:
+        save_report(report, args.save)
+        print(f"Saved to {args.save}")
+
+    if args.compare:
+        print()
+        return _print_compare(report, load_report(args.compare), args.threshold)
+    return 0
+
+
+def cmd_compare(args) -> int:
+    return _print_compare(load_report(args.current), load_report(args.baseline), args.threshold)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Payroll benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Generate synthetic dataset")
+    generate.add_argument("--org-units", type=int, default=20)
+    generate.add_argument("--employees", type=int, default=2000)
+    generate.add_argument("--multi-position-share", type=float, default=0.15)
+    generate.add_argument("--groups", type=int, default=40)
+    generate.add_argument("--group-depth", type=int, default=3)
+    generate.add_argument("--memberships", type=int, default=2, help="Max groups per position")
+    generate.add_argument("--position-rule-share", type=float, default=0.05)
+    generate.add_argument("--no-timesheets", action="store_true")
+    generate.add_argument("--run-periods", type=int, default=5, help="Draft periods for calculation_run")
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--reset", action="store_true", help="Remove existing benchmark data first")
+    generate.set_defaults(func=cmd_generate)
+
+    reset = commands.add_parser("reset", help="Remove benchmark dataset")
+    reset.set_defaults(func=cmd_reset)
+
+    run = commands.add_parser("run", help="Run scenarios against the API")
+    run.add_argument("--base-url", default="http://localhost:8000")
+    run.add_argument("--scenario", action="append", help="Run only this scenario (repeatable)")
+    run.add_argument("--iterations", type=int, help="Override iterations per scenario")
+    run.add_argument("--concurrency", type=int, help="Override parallel clients per scenario")
+    run.add_argument("--sample", type=int, default=200, help="Employees sampled for per-employee scenarios")
+    run.add_argument("--save", help="Save report to JSON file")
+    run.add_argument("--compare", help="Compare with baseline JSON file")
+    run.add_argument("--threshold", type=float, default=0.2, help="Allowed latency growth (0.2 = 20%%)")
+    run.set_defaults(func=cmd_run)
+
+    compare = commands.add_parser("compare", help="Compare two saved reports")
+    compare.add_argument("current")
+    compare.add_argument("baseline")
+    compare.add_argument("--threshold", type=float, default=0.2)
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
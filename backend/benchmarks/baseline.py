@@ -0,0 +1,60 @@
+"""
+Збереження результатів і порівняння з baseline
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+
+# Метрики, зростання яких вважається регресією
+COMPARED_METRICS = ("p50_ms", "p95_ms", "queries_avg")
+
+
+def make_report(base_url: str, context: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "base_url": base_url,
+        "employees_total": context.get("employees_total"),
+        "scenarios": results,
+    }
+
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_reports(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = 0.2
+) -> Tuple[List[str], List[str]]:
+    """
+    Порівняти звіт з baseline; повертає (рядки таблиці, регресії).
+
+    Латентність - регресія, якщо зросла більш ніж на threshold;
+    кількість запитів - будь-яке зростання.
+    """
+    lines = [f"{'scenario':<26}{'metric':<14}{'baseline':>12}{'current':>12}{'change':>10}"]
+    regressions = []
+
+    for name, metrics in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or "skipped" in metrics or "skipped" in base:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            lines.append(f"{name:<26}{metric:<14}{old:>12.2f}{new:>12.2f}{change:>+10.1%}")
+            limit = 0.0 if metric == "queries_avg" else threshold
+            if change > limit:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.1%})")
+
+    return lines, regressions
@@ -0,0 +1,328 @@
+"""
+Генератор синтетичних даних для бенчмарків.
+
+Всі записи позначені префіксом коду BENCH / created_by = "benchmark",
+тож набір можна перегенерувати (--reset), не чіпаючи інші дані.
+"""
+import random
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    AccrualDocument,
+    AccrualResult,
+    AccrualSummary,
+    CalculationPeriod,
+    CalculationRule,
+    CalculationTemplate,
+    Contract,
+    Employee,
+    Group,
+    GroupClosure,
+    OrganizationalUnit,
+    Position,
+    PositionGroup,
+    TemplateRule,
+    Timesheet
+)
+
+
+CREATED_BY = "benchmark"
+PREFIX = "BENCH"
+TEMPLATE_CODE = "BENCH_MONTHLY"
+RUN_PERIOD_PREFIX = f"{PREFIX}-RUN-"
+GROUP_TYPES = ("social", "professional", "administrative")
+
+# Період, на який генеруються табелі і розрахунки
+PERIOD_START = date(2024, 1, 1)
+PERIOD_END = date(2024, 1, 31)
+VALID_FROM = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+# Глобальні правила шаблону: (code, rule_type, формула)
+GLOBAL_RULES = [
+    ("BASE_SALARY", "accrual", "base_salary"),
+    ("BONUS", "accrual", "base_salary * 0.05"),
+    ("PIT", "tax", "gross_salary * 0.18"),
+    ("WAR_TAX", "tax", "gross_salary * 0.015"),
+    ("UNION_FEE", "deduction", "0"),
+]
+
+INSERT_CHUNK = 5000
+
+
+class DatasetParams:
+    """
+    Параметри синтетичного набору
+    """
+
+    def __init__(
+        self,
+        org_units: int = 20,
+        employees: int = 2000,
+        multi_position_share: float = 0.15,
+        groups: int = 40,
+        group_depth: int = 3,
+        memberships_per_position: int = 2,
+        position_rule_share: float = 0.05,
+        timesheets: bool = True,
+        run_periods: int = 5,
+        seed: int = 42
+    ):
+        self.org_units = org_units
+        self.employees = employees
+        self.multi_position_share = multi_position_share
+        self.groups = groups
+        self.group_depth = group_depth
+        self.memberships_per_position = memberships_per_position
+        self.position_rule_share = position_rule_share
+        self.timesheets = timesheets
+        self.run_periods = run_periods
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def _insert_returning_ids(db: Session, model, rows: List[Dict[str, Any]]) -> List[int]:
+    ids: List[int] = []
+    for start in range(0, len(rows), INSERT_CHUNK):
+        chunk = rows[start:start + INSERT_CHUNK]
+        ids.extend(db.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            chunk
+        ).scalars().all())
+    return ids
+
+
+def _insert(db: Session, model, rows: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK):
+        chunk = rows[start:start + INSERT_CHUNK]
+        if chunk:
+            db.execute(insert(model), chunk)
+
+
+def dataset_exists(db: Session) -> bool:
+    return db.execute(
+        select(func.count()).select_from(Employee).where(Employee.created_by == CREATED_BY)
+    ).scalar() > 0
+
+
+def reset_dataset(db: Session) -> None:
+    """
+    Видалити всі дані бенчмарку (включно з документами розрахунків)
+    """
+    bench_periods = select(CalculationPeriod.id).where(CalculationPeriod.created_by == CREATED_BY)
+    bench_documents = select(AccrualDocument.id).where(AccrualDocument.period_id.in_(bench_periods))
+    bench_templates = select(CalculationTemplate.id).where(CalculationTemplate.code == TEMPLATE_CODE)
+    bench_employees = select(Employee.id).where(Employee.created_by == CREATED_BY)
+
+    db.execute(delete(AccrualSummary).where(AccrualSummary.document_id.in_(bench_documents)))
+    db.execute(delete(AccrualSummary).where(AccrualSummary.employee_id.in_(bench_employees)))
+    db.execute(delete(AccrualResult).where(AccrualResult.document_id.in_(bench_documents)))
+    db.execute(delete(AccrualResult).where(AccrualResult.employee_id.in_(bench_employees)))
+    db.execute(delete(AccrualDocument).where(AccrualDocument.period_id.in_(bench_periods)))
+    db.execute(delete(CalculationPeriod).where(CalculationPeriod.created_by == CREATED_BY))
+    db.execute(delete(TemplateRule).where(TemplateRule.template_id.in_(bench_templates)))
+    db.execute(delete(CalculationTemplate).where(CalculationTemplate.code == TEMPLATE_CODE))
+    db.execute(delete(CalculationRule).where(CalculationRule.created_by == CREATED_BY))
+    # Позиції, контракти, табелі і членство в групах видаляються каскадно
+    db.execute(delete(Employee).where(Employee.created_by == CREATED_BY))
+    bench_groups = select(Group.id).where(Group.code.like(f"{PREFIX}-%"))
+    db.execute(delete(GroupClosure).where(GroupClosure.descendant_id.in_(bench_groups)))
+    db.execute(delete(Group).where(Group.code.like(f"{PREFIX}-%")))
+    db.execute(delete(OrganizationalUnit).where(OrganizationalUnit.code.like(f"{PREFIX}-%")))
+    db.commit()
+
+
+def _working_days(start: date, end: date) -> List[date]:
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def generate_dataset(db: Session, params: DatasetParams) -> Dict[str, int]:
+    """
+    Згенерувати набір даних; повертає кількість створених записів по таблицях
+    """
+    rnd = random.Random(params.seed)
+    counts: Dict[str, int] = {}
+
+    # Підрозділи: корінь + дочірні
+    root_id = _insert_returning_ids(db, OrganizationalUnit, [{
+        "code": f"{PREFIX}-OU-ROOT", "name": "Benchmark company", "level": 1
+    }])[0]
+    unit_ids = _insert_returning_ids(db, OrganizationalUnit, [
+        {"code": f"{PREFIX}-OU-{i:04d}", "name": f"Benchmark unit {i}", "level": 2, "parent_id": root_id}
+        for i in range(1, params.org_units + 1)
+    ])
+    counts["organizational_units"] = len(unit_ids) + 1
+
+    # Дерево груп: кожна наступна група - дочірня до випадкової групи вищого рівня
+    groups: List[Dict[str, Any]] = []
+    for i in range(1, params.groups + 1):
+        candidates = [g for g in groups if g["level"] < params.group_depth]
+        parent = rnd.choice(candidates) if candidates and rnd.random() < 0.7 else None
+        name = f"Benchmark group {i}"
+        group = {
+            "code": f"{PREFIX}-G-{i:04d}",
+            "name": name,
+            "group_type": parent["group_type"] if parent else rnd.choice(GROUP_TYPES),
+            "level": parent["level"] + 1 if parent else 1,
+            "full_path": f"{parent['full_path']} → {name}" if parent else name,
+            "parent_index": parent["index"] if parent else None,
+            "index": i - 1,
+        }
+        groups.append(group)
+
+    group_ids: List[int] = []
+    for group in groups:
+        row = {k: v for k, v in group.items() if k not in ("parent_index", "index")}
+        row["parent_id"] = group_ids[group["parent_index"]] if group["parent_index"] is not None else None
+        group_ids.append(_insert_returning_ids(db, Group, [row])[0])
+
+    # Closure table: група з собою і з усіма предками
+    closure = []
+    for group, group_id in zip(groups, group_ids):
+        depth, current = 0, group
+        while current is not None:
+            closure.append({"ancestor_id": group_ids[current["index"]], "descendant_id": group_id, "depth": depth})
+            depth += 1
+            current = groups[current["parent_index"]] if current["parent_index"] is not None else None
+    _insert(db, GroupClosure, closure)
+    counts["groups"] = len(group_ids)
+
+    # Працівники, позиції, контракти
+    employee_ids = _insert_returning_ids(db, Employee, [
+        {
+            "personnel_number": f"{PREFIX}-{i:07d}",
+            "first_name": f"Name{i}",
+            "last_name": f"Bench{i}",
+            "hire_date": date(2022, 1, 1),
+            "is_active": True,
+            "created_by": CREATED_BY,
+        }
+        for i in range(1, params.employees + 1)
+    ])
+    counts["employees"] = len(employee_ids)
+
+    position_rows = []
+    for employee_id in employee_ids:
+        count = 2 if rnd.random() < params.multi_position_share else 1
+        for k in range(count):
+            position_rows.append({
+                "employee_id": employee_id,
+                "organizational_unit_id": rnd.choice(unit_ids),
+                "position_code": f"{PREFIX}-P-{employee_id}-{k + 1}",
+                "position_name": "Benchmark position",
+                "employment_rate": Decimal("1.0") if k == 0 else Decimal(rnd.choice(["0.25", "0.5"])),
+                "start_date": date(2022, 1, 1),
+                "is_active": True,
+                "created_by": CREATED_BY,
+            })
+    position_ids = _insert_returning_ids(db, Position, position_rows)
+    counts["positions"] = len(position_ids)
+
+    _insert(db, Contract, [
+        {
+            "position_id": position_id,
+            "contract_type": "salary",
+            "base_rate": Decimal(rnd.randint(160, 1200) * 50),
+            "currency": "UAH",
+            "start_datetime": VALID_FROM,
+            "is_active": True,
+            "created_by": CREATED_BY,
+        }
+        for position_id in position_ids
+    ])
+    counts["contracts"] = len(position_ids)
+
+    # Членство в групах
+    memberships = []
+    for position_id in position_ids:
+        for group_id in rnd.sample(group_ids, rnd.randint(0, min(params.memberships_per_position, len(group_ids)))):
+            memberships.append({
+                "position_id": position_id,
+                "group_id": group_id,
+                "valid_from": VALID_FROM,
+                "is_active": True,
+            })
+    _insert(db, PositionGroup, memberships)
+    counts["position_groups"] = len(memberships)
+
+    # Правила на всіх рівнях ієрархії
+    rule_base = {"valid_from": VALID_FROM, "is_active": True, "created_by": CREATED_BY}
+    global_rule_ids = _insert_returning_ids(db, CalculationRule, [
+        {**rule_base, "code": code, "name": f"Benchmark {code}", "rule_type": rule_type, "sql_code": formula}
+        for code, rule_type, formula in GLOBAL_RULES
+    ])
+    rules = []
+    for unit_id in rnd.sample(unit_ids, max(1, len(unit_ids) // 3)):
+        rules.append({**rule_base, "code": "BONUS", "name": "Unit bonus", "rule_type": "accrual",
+                      "sql_code": "base_salary * 0.1", "organizational_unit_id": unit_id})
+    for group_id in rnd.sample(group_ids, max(1, len(group_ids) // 4)):
+        code, rule_type, formula = rnd.choice([
+            ("BONUS", "accrual", "base_salary * 0.15"),
+            ("PIT", "tax", "gross_salary * 0.09"),
+            ("UNION_FEE", "deduction", "gross_salary * 0.01"),
+        ])
+        rules.append({**rule_base, "code": code, "name": f"Group {code}", "rule_type": rule_type,
+                      "sql_code": formula, "group_id": group_id})
+    for position_id in position_ids:
+        if rnd.random() < params.position_rule_share:
+            rules.append({**rule_base, "code": "BONUS", "name": "Personal bonus", "rule_type": "accrual",
+                          "sql_code": "base_salary * 0.2 + 500", "position_id": position_id})
+    _insert(db, CalculationRule, rules)
+    counts["calculation_rules"] = len(global_rule_ids) + len(rules)
+
+    # Шаблон розрахунку
+    template_id = _insert_returning_ids(db, CalculationTemplate, [{
+        "code": TEMPLATE_CODE, "name": "Benchmark monthly", "is_active": True
+    }])[0]
+    _insert(db, TemplateRule, [
+        {"template_id": template_id, "rule_id": rule_id, "execution_order": order, "is_active": True}
+        for order, rule_id in enumerate(global_rule_ids, start=1)
+    ])
+
+    # Табелі: 8-годинний робочий день на кожен робочий день періоду
+    if params.timesheets:
+        days = _working_days(PERIOD_START, PERIOD_END)
+        rows = []
+        for position_id in position_ids:
+            for day in days:
+                start = datetime(day.year, day.month, day.day, 9, tzinfo=timezone.utc)
+                rows.append({
+                    "position_id": position_id,
+                    "work_start": start,
+                    "work_end": start + timedelta(hours=8),
+                    "duration_minutes": 480,
+                    "status": "approved",
+                    "created_by": CREATED_BY,
+                })
+        _insert(db, Timesheet, rows)
+        counts["timesheets"] = len(rows)
+
+    # Чернеткові періоди - по одному на кожен запуск розрахунку
+    _insert(db, CalculationPeriod, [
+        {
+            "period_code": f"{RUN_PERIOD_PREFIX}{i:03d}",
+            "period_name": f"Benchmark run {i}",
+            "start_date": PERIOD_START,
+            "end_date": PERIOD_END,
+            "period_type": "monthly",
+            "status": "draft",
+            "created_by": CREATED_BY,
+        }
+        for i in range(1, params.run_periods + 1)
+    ])
+    counts["calculation_periods"] = params.run_periods
+
+    db.commit()
+    return counts
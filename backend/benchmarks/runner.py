@@ -0,0 +1,182 @@
+"""
+Запуск сценаріїв проти працюючого API і збір метрик.
+
+Кількість SQL-запитів і час БД беруться із заголовків X-DB-Query-Count
+і X-DB-Time-Ms, які додає middleware інструментування.
+"""
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class HttpResult:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, elapsed: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def header_number(self, name: str) -> Optional[float]:
+        value = self.headers.get(name.lower())
+        return float(value) if value is not None else None
+
+
+class ApiClient:
+    """
+    Мінімальний HTTP-клієнт (stdlib), що міряє час кожного запиту
+    """
+
+    def __init__(self, base_url: str, timeout: float = 600.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> HttpResult:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            request.add_header(name, value)
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                status = response.status
+                response_headers = {k.lower(): v for k, v in response.headers.items()}
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+            response_headers = {k.lower(): v for k, v in e.headers.items()}
+        return HttpResult(status, response_headers, body, time.perf_counter() - started)
+
+    def get(self, path: str, headers: Optional[Dict[str, str]] = None) -> HttpResult:
+        return self.request("GET", path, headers=headers)
+
+    def post(self, path: str, payload: Dict[str, Any]) -> HttpResult:
+        return self.request("POST", path, payload=payload)
+
+
+class Scenario:
+    """
+    Сценарій бенчмарку: step(client, context, i) виконує одну ітерацію.
+
+    concurrency - кількість паралельних клієнтів; background - крок, який
+    безперервно виконується в окремому потоці під час вимірювання (фонове навантаження).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        step: Callable[[ApiClient, Dict[str, Any], int], HttpResult],
+        iterations: int = 50,
+        warmup: int = 3,
+        expected_status: Tuple[int, ...] = (200,),
+        max_iterations: Optional[Callable[[Dict[str, Any]], int]] = None,
+        concurrency: int = 1,
+        background: Optional[Callable[[ApiClient, Dict[str, Any], int], HttpResult]] = None
+    ):
+        self.name = name
+        self.step = step
+        self.iterations = iterations
+        self.warmup = warmup
+        self.expected_status = expected_status
+        self.max_iterations = max_iterations
+        self.concurrency = concurrency
+        self.background = background
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Перцентиль методом nearest-rank
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _run_background(client: ApiClient, scenario: Scenario, context: Dict[str, Any], stop: threading.Event) -> None:
+    i = 0
+    while not stop.is_set():
+        scenario.background(client, context, i)
+        i += 1
+
+
+def run_scenario(
+    client: ApiClient,
+    scenario: Scenario,
+    context: Dict[str, Any],
+    iterations: Optional[int] = None,
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Виконати сценарій; латентність у мс, throughput - запитів за секунду
+    """
+    total = iterations if iterations is not None else scenario.iterations
+    warmup = scenario.warmup
+    if scenario.max_iterations is not None:
+        available = scenario.max_iterations(context)
+        warmup = min(warmup, available)
+        total = min(total, available - warmup)
+    if total <= 0:
+        return {"skipped": "no input data left for this scenario"}
+    workers = concurrency or scenario.concurrency
+
+    for i in range(warmup):
+        scenario.step(client, context, i)
+
+    stop = threading.Event()
+    background = None
+    if scenario.background is not None:
+        background = threading.Thread(target=_run_background, args=(client, scenario, context, stop), daemon=True)
+        background.start()
+
+    started = time.perf_counter()
+    try:
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(
+                    lambda i: scenario.step(client, context, i),
+                    range(warmup, warmup + total)
+                ))
+        else:
+            results = [scenario.step(client, context, i) for i in range(warmup, warmup + total)]
+        wall = time.perf_counter() - started
+    finally:
+        stop.set()
+        if background is not None:
+            background.join()
+
+    latencies = [result.elapsed * 1000 for result in results]
+    errors = sum(1 for result in results if result.status not in scenario.expected_status)
+    queries = [q for q in (result.header_number("X-DB-Query-Count") for result in results) if q is not None]
+    db_times = [t for t in (result.header_number("X-DB-Time-Ms") for result in results) if t is not None]
+
+    return {
+        "iterations": total,
+        "concurrency": workers,
+        "errors": errors,
+        "throughput_rps": round(total / wall, 2) if wall > 0 else None,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "max_ms": round(max(latencies), 2),
+        "queries_avg": round(sum(queries) / len(queries), 2) if queries else None,
+        "queries_max": max(queries) if queries else None,
+        "db_time_avg_ms": round(sum(db_times) / len(db_times), 2) if db_times else None,
+    }
@@ -0,0 +1,134 @@
+"""
+Сценарії для гарячих ендпоінтів
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import AccrualDocument, CalculationPeriod, Employee
+from benchmarks.datagen import CREATED_BY, PERIOD_END, PERIOD_START, RUN_PERIOD_PREFIX, TEMPLATE_CODE
+from benchmarks.runner import ApiClient, HttpResult, Scenario
+
+
+CALCULATION_DATE = "2024-01-15"
+
+
+def load_context(db: Session, sample_size: int = 200) -> Dict[str, Any]:
+    """
+    Вхідні дані сценаріїв з БД: вибірка працівників і ще не розраховані періоди
+    """
+    employee_ids = db.execute(
+        select(Employee.id)
+        .where(Employee.created_by == CREATED_BY)
+        .order_by(Employee.id)
+    ).scalars().all()
+    step = max(1, len(employee_ids) // sample_size)
+
+    run_period_ids = db.execute(
+        select(CalculationPeriod.id)
+        .where(
+            CalculationPeriod.period_code.like(f"{RUN_PERIOD_PREFIX}%"),
+            CalculationPeriod.status == "draft",
+            ~CalculationPeriod.id.in_(select(AccrualDocument.period_id))
+        )
+        .order_by(CalculationPeriod.id)
+    ).scalars().all()
+
+    if not employee_ids:
+        raise RuntimeError("Benchmark dataset not found, run `python -m benchmarks generate` first")
+
+    return {
+        "employee_ids": employee_ids[::step][:sample_size],
+        "employees_total": len(employee_ids),
+        "run_period_ids": list(run_period_ids),
+    }
+
+
+def _pick(items: List[Any], i: int) -> Any:
+    return items[i % len(items)]
+
+
+def _calculate(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    employee_id = _pick(ctx["employee_ids"], i)
+    return client.get(f"/api/payroll/calculate/{employee_id}?calculation_date={CALCULATION_DATE}")
+
+
+def _calculate_split(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    employee_id = _pick(ctx["employee_ids"], i)
+    return client.get(
+        f"/api/payroll/calculate-split/{employee_id}?start_date={PERIOD_START}&end_date={PERIOD_END}"
+    )
+
+
+def _calculate_all(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    return client.get(f"/api/payroll/calculate-all?calculation_date={CALCULATION_DATE}")
+
+
+def _run_calculation(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    # Кожен запуск розраховує окремий чернетковий період
+    period_id = ctx["run_period_ids"][i]
+    return client.post("/api/calculations/run", {"period_id": period_id, "template_code": TEMPLATE_CODE})
+
+
+def _groups_tree(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    return client.get("/api/groups/tree")
+
+
+def _groups_tree_conditional(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    if "tree_etag" not in ctx:
+        ctx["tree_etag"] = client.get("/api/groups/tree").headers.get("etag", "")
+    return client.get("/api/groups/tree", headers={"If-None-Match": ctx["tree_etag"]})
+
+
+def _employees_page(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    # Послідовний обхід списку курсором; після останньої сторінки - знову з початку
+    after_id = ctx.get("employees_after_id")
+    path = "/api/employees/?limit=100&total=none"
+    if after_id:
+        path += f"&after_id={after_id}"
+    result = client.get(path)
+    if result.status == 200:
+        ctx["employees_after_id"] = result.json()["next_after_id"]
+    return result
+
+
+def _employees_page_parallel(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    # Незалежні сторінки (курсор = id вибраного працівника) для паралельних клієнтів
+    return client.get(f"/api/employees/?limit=100&total=none&after_id={_pick(ctx['employee_ids'], i)}")
+
+
+def _employee_detail(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    return client.get(f"/api/employees/{_pick(ctx['employee_ids'], i)}")
+
+
+def _periods_list(client: ApiClient, ctx: Dict[str, Any], i: int) -> HttpResult:
+    return client.get("/api/periods/?limit=100")
+
+
+SCENARIOS = [
+    Scenario("payroll_calculate", _calculate, iterations=200),
+    Scenario("payroll_calculate_split", _calculate_split, iterations=100),
+    Scenario("payroll_calculate_all", _calculate_all, iterations=3, warmup=1),
+    Scenario(
+        "calculation_run", _run_calculation, iterations=3, warmup=0,
+        max_iterations=lambda ctx: len(ctx["run_period_ids"])
+    ),
+    Scenario("groups_tree", _groups_tree, iterations=200),
+    Scenario("groups_tree_304", _groups_tree_conditional, iterations=200, expected_status=(304,)),
+    Scenario("employees_page", _employees_page, iterations=100),
+    Scenario("employee_detail", _employee_detail, iterations=200),
+    Scenario("periods_list", _periods_list, iterations=100),
+    # Паралельні читання: async-ендпоінти не блокують event loop одне одного
+    Scenario("employee_detail_concurrent", _employee_detail, iterations=400, concurrency=16),
+    Scenario("employees_page_concurrent", _employees_page_parallel, iterations=200, concurrency=16),
+    # Читання під час важкого розрахунку в тому ж воркері
+    Scenario(
+        "reads_during_calculate_all", _employee_detail, iterations=200, concurrency=4,
+        background=_calculate_all
+    ),
+]
+
+
+def scenario_by_name() -> Dict[str, Scenario]:
+    return {scenario.name: scenario for scenario in SCENARIOS}
@@ -0,0 +1,133 @@
+"""
+Інкрементальне зведення accrual_summary дає ті самі рядки, що й backfill міграції 004
+"""
+import importlib.util
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import delete, select, text
+
+from tests.conftest import requires_database
+
+pytestmark = requires_database
+
+PREFIX = "SUM-TEST"
+MIGRATION = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "004_20261018120000_accrual_summary_table.py"
+
+
+def backfill_select(connection) -> str:
+    """
+    SELECT, яким міграція 004 заповнює accrual_summary
+    """
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    spec = importlib.util.spec_from_file_location("accrual_summary_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    with Operations.context(MigrationContext.configure(connection)):
+        return migration._summary_select()
+
+
+@pytest.fixture
+def db():
+    from app.core.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def document(db):
+    from app.models import (
+        AccrualDocument, AccrualResult, AccrualSummary, CalculationPeriod, CalculationRule,
+        CalculationTemplate, Employee, OrganizationalUnit, Position
+    )
+
+    unit = OrganizationalUnit(code=f"{PREFIX}-OU", name="Summary unit", level=1)
+    employee = Employee(
+        personnel_number=f"{PREFIX}-0001", first_name="Test", last_name="Employee",
+        hire_date=date(2026, 1, 1), created_by=PREFIX
+    )
+    template = CalculationTemplate(code=f"{PREFIX}-TPL", name="Summary template")
+    period = CalculationPeriod(
+        period_code=f"{PREFIX}-2026-09", period_name="September 2026",
+        start_date=date(2026, 9, 1), end_date=date(2026, 9, 30), period_type="monthly", created_by=PREFIX
+    )
+    rule = CalculationRule(
+        code="BASE_SALARY", name="Summary rule", rule_type="accrual",
+        valid_from=datetime(2026, 1, 1, tzinfo=timezone.utc), created_by=PREFIX
+    )
+    db.add_all([unit, employee, template, period, rule])
+    db.flush()
+
+    position = Position(
+        employee_id=employee.id, organizational_unit_id=unit.id, position_code=f"{PREFIX}-P",
+        position_name="Engineer", employment_rate=Decimal("1.0"), start_date=date(2026, 1, 1), created_by=PREFIX
+    )
+    db.add(position)
+    db.flush()
+
+    doc = AccrualDocument(
+        document_number=f"{PREFIX}-DOC", period_id=period.id, template_id=template.id,
+        status="calculated", created_by=PREFIX
+    )
+    db.add(doc)
+    db.flush()
+    db.add(AccrualResult(
+        document_id=doc.id, position_id=position.id, employee_id=employee.id,
+        organizational_unit_id=unit.id, rule_id=rule.id, rule_code=rule.code,
+        rule_source_type="global", amount=Decimal("30000.00"), calculation_base=Decimal("30000.00")
+    ))
+    db.commit()
+
+    yield doc.id
+
+    db.rollback()
+    db.execute(delete(AccrualSummary).where(AccrualSummary.document_id == doc.id))
+    db.execute(delete(AccrualResult).where(AccrualResult.document_id == doc.id))
+    db.execute(delete(AccrualDocument).where(AccrualDocument.id == doc.id))
+    db.execute(delete(Position).where(Position.id == position.id))
+    db.execute(delete(CalculationRule).where(CalculationRule.id == rule.id))
+    db.execute(delete(CalculationPeriod).where(CalculationPeriod.id == period.id))
+    db.execute(delete(CalculationTemplate).where(CalculationTemplate.id == template.id))
+    db.execute(delete(Employee).where(Employee.id == employee.id))
+    db.execute(delete(OrganizationalUnit).where(OrganizationalUnit.id == unit.id))
+    db.commit()
+
+
+def summary_rows(db, document_id: int):
+    from app.models import AccrualSummary
+
+    columns = AccrualSummary.__table__.columns
+    return db.execute(
+        select(*columns).where(AccrualSummary.document_id == document_id).order_by(AccrualSummary.result_id)
+    ).all()
+
+
+def test_synced_rows_match_migration_backfill(db, document):
+    from app.models import AccrualSummary
+    from app.services.accrual_summary import sync_document_summary
+
+    assert sync_document_summary(db, document) == 1
+    db.commit()
+    synced = summary_rows(db, document)
+
+    db.execute(delete(AccrualSummary).where(AccrualSummary.document_id == document))
+    db.execute(
+        text(f"INSERT INTO accrual_summary SELECT * FROM ({backfill_select(db.connection())}) s WHERE s.document_id = :id"),
+        {"id": document}
+    )
+    db.commit()
+    backfilled = summary_rows(db, document)
+
+    assert synced == backfilled
+    # Кінець періоду - останній день 23:59:59, як у calculation_periods.end_datetime
+    assert synced[0].end_datetime.time() == time(23, 59, 59)
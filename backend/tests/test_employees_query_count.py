@@ -0,0 +1,121 @@
+"""
+Кількість SQL-запитів ендпоінтів працівників не залежить від розміру сторінки
+і кількості позицій (eager loading замість N+1)
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, event, select
+
+from tests.conftest import requires_database
+
+pytestmark = requires_database
+
+PREFIX = "QC-TEST"
+EMPLOYEES = 60
+
+# Сторінка працівників + їхні позиції з підрозділами (selectinload) [+ COUNT для total=exact]
+LIST_QUERIES = {"none": 2, "exact": 3}
+# Працівник + позиції з підрозділами + контракти позицій
+DETAIL_QUERIES = 3
+
+
+@pytest.fixture(scope="module")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        # Перше підключення engine виконує службові запити - не враховувати їх
+        test_client.get("/api/employees/?limit=1&total=none")
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def employees():
+    from app.core.database import Base, SessionLocal, engine
+    from app.models import Contract, Employee, OrganizationalUnit, Position
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        unit = OrganizationalUnit(code=f"{PREFIX}-OU", name="Query count unit", level=1)
+        db.add(unit)
+        db.flush()
+
+        ids = []
+        for i in range(EMPLOYEES):
+            employee = Employee(
+                personnel_number=f"{PREFIX}-{i:04d}", first_name="Test", last_name=f"Employee {i}",
+                hire_date=date(2023, 1, 1), created_by=PREFIX
+            )
+            db.add(employee)
+            db.flush()
+            # Від 1 до 3 позицій з контрактом на кожній
+            for k in range(i % 3 + 1):
+                position = Position(
+                    employee_id=employee.id, organizational_unit_id=unit.id,
+                    position_code=f"{PREFIX}-P-{i}-{k}", position_name="Engineer",
+                    employment_rate=Decimal("1.0"), start_date=date(2023, 1, 1), created_by=PREFIX
+                )
+                db.add(position)
+                db.flush()
+                db.add(Contract(
+                    position_id=position.id, contract_type="salary", base_rate=Decimal("30000"),
+                    start_datetime=datetime(2023, 1, 1, tzinfo=timezone.utc), created_by=PREFIX
+                ))
+            ids.append(employee.id)
+        db.commit()
+
+        yield ids
+    finally:
+        db.rollback()
+        positions = select(Position.id).where(Position.created_by == PREFIX)
+        db.execute(delete(Contract).where(Contract.position_id.in_(positions)))
+        db.execute(delete(Position).where(Position.created_by == PREFIX))
+        db.execute(delete(Employee).where(Employee.created_by == PREFIX))
+        db.execute(delete(OrganizationalUnit).where(OrganizationalUnit.code == f"{PREFIX}-OU"))
+        db.commit()
+        db.close()
+
+
+def count_queries(client, path: str) -> int:
+    """
+    Кількість SQL-запитів (before_cursor_execute) під час одного HTTP-запиту
+    """
+    from app.core.database import get_async_engine, get_engine
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = [get_engine(), get_async_engine().sync_engine]
+    for target in engines:
+        event.listen(target, "before_cursor_execute", count)
+    try:
+        response = client.get(path)
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", count)
+
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+@pytest.mark.parametrize("total", ["none", "exact"])
+def test_employee_list_query_count_does_not_grow_with_page_size(client, employees, total):
+    after_id = employees[0] - 1
+    small = count_queries(client, f"/api/employees/?limit=5&after_id={after_id}&total={total}")
+    large = count_queries(client, f"/api/employees/?limit=50&after_id={after_id}&total={total}")
+
+    assert small == large == LIST_QUERIES[total]
+
+
+def test_employee_detail_query_count_does_not_grow_with_positions(client, employees):
+    # employees[0] має 1 позицію, employees[2] - 3
+    single = count_queries(client, f"/api/employees/{employees[0]}")
+    several = count_queries(client, f"/api/employees/{employees[2]}")
+
+    assert single == several == DETAIL_QUERIES